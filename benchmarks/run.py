@@ -0,0 +1,233 @@
+"""Microbenchmarks of the node data pipeline and the cameras
+
+Every benchmark runs at each size on a headless context (EGL, so software
+rasterizers such as llvmpipe work) and reports the best time over the
+repeats, the throughput in items per second and the peak memory allocated
+by a single run, as traced by tracemalloc.
+
+    python benchmarks/run.py
+    python benchmarks/run.py --sizes 1e3 1e5 1e7 --filter camera --json out.json
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from pyqtmgl.cameras import ArcballCamera, RectCamera
+from pyqtmgl.nodes.imageslice import ImageSlice
+from pyqtmgl.nodes.linecollection import LineCollection, SampledLineCollection
+from pyqtmgl.nodes.pointcloud import Pointcloud
+from pyqtmgl.offscreen import create_headless_context
+
+DEFAULT_SIZES = (1e3, 1e4, 1e5, 1e6)
+DEFAULT_REPEAT = 5
+N_LINES = 16
+
+# name -> (setup, largest size it runs at, unlimited by default)
+# setup(ctx, n) prepares the inputs and returns the function to time
+BENCHMARKS: Dict[str, tuple] = {}
+
+def benchmark(name: str, max_size: float = float('inf')):
+    def register(setup: Callable):
+        BENCHMARKS[name] = (setup, max_size)
+        return setup
+    return register
+
+# update_variables only validates and stores most arrays, so these benchmarks
+# also pack the buffers the update dirties: all the CPU work before an upload
+def updated(node, names, **variables):
+    def run():
+        node.update_variables(**variables)
+        node.pack(names)
+    return run
+
+@benchmark('update_variables/1d')
+def update_1d(ctx, n):
+    node = Pointcloud(None)
+    y = np.random.rand(n)
+    return updated(node, ['points'], points=y)
+
+@benchmark('update_variables/2d')
+def update_2d(ctx, n):
+    node = Pointcloud(None)
+    points = np.random.rand(n, 2)
+    return updated(node, ['points'], points=points)
+
+@benchmark('update_variables/3d')
+def update_3d(ctx, n):
+    node = Pointcloud(None)
+    points = np.random.rand(n, 3)
+    return updated(node, ['points'], points=points)
+
+@benchmark('update_variables/colors')
+def update_colors(ctx, n):
+    node = Pointcloud(None, np.random.rand(n, 2))
+    colors = np.random.rand(n, 3)
+    return updated(node, ['colors'], colors=colors)
+
+@benchmark('update_variables/alphas')
+def update_alphas(ctx, n):
+    node = Pointcloud(None, np.random.rand(n, 2))
+    alphas = np.random.rand(n)
+    return updated(node, ['alphas'], alphas=alphas)
+
+@benchmark('update_variables/colors_u8')
+def update_colors_u8(ctx, n):
+    node = Pointcloud(None, np.random.rand(n, 2))
+    colors = np.random.randint(0, 256, (n, 4), dtype=np.uint8)
+    return updated(node, ['colors'], colors=colors)
+
+@benchmark('update_variables/scalars')
+def update_scalars(ctx, n):
+    node = Pointcloud(None, np.random.rand(n, 2))
+    scalars = np.random.rand(n)
+    return updated(node, ['scalars'], scalars=scalars)
+
+@benchmark('linecollection/update_variables')
+def linecollection_update(ctx, n):
+    node = LineCollection(None)
+    lines = np.random.rand(N_LINES, max(2, n // N_LINES))
+    return lambda: node.update_variables(lines=lines, offset=1.0)
+
+@benchmark('sampledlinecollection/upload')
+def sampled_upload(ctx, n):
+    node = SampledLineCollection(ctx)
+    values = np.random.randint(-2**15, 2**15, (N_LINES, max(2, n // N_LINES)), dtype='i2')
+    def run():
+        node.update_variables(values=values)
+        node.prepare_vao()
+        ctx.finish()
+    return run
+
+@benchmark('prepare_vao/full')
+def prepare_full(ctx, n):
+    node = Pointcloud(ctx, np.random.rand(n, 2))
+    def run():
+        node.mark_dirty()
+        node.prepare_vao()
+        ctx.finish()
+    return run
+
+@benchmark('prepare_vao/alphas')
+def prepare_alphas(ctx, n):
+    node = Pointcloud(ctx, np.random.rand(n, 2))
+    node.prepare_vao()
+    alphas = np.random.rand(n)
+    def run():
+        node.update_variables(alphas=alphas)
+        node.prepare_vao()
+        ctx.finish()
+    return run
+
+# two float32 volumes in memory plus a 3D texture on the GPU
+@benchmark('imageslice/upload', max_size=1e7)
+def imageslice_upload(ctx, n):
+    side = max(2, int(round(n ** (1 / 3))))
+    node = ImageSlice(ctx, im=np.random.rand(side, side, side).astype('f4'))
+    volume = np.random.rand(side, side, side).astype('f4')
+    def run():
+        node.update_variables(im=volume)
+        node.prepare_vao()
+        ctx.finish()
+    return run
+
+# one float32 volume in memory; only the slices shown are uploaded
+@benchmark('imageslice/lazy_scrub', max_size=1e8)
+def imageslice_lazy_scrub(ctx, n):
+    side = max(2, int(round(n ** (1 / 3))))
+    node = ImageSlice(ctx, im=np.random.rand(side, side, side).astype('f4'), lazy=True)
+    slices = iter(range(10**9))
+    def run():
+        node.update_variables(slice=next(slices) % side)
+        node.prepare_vao()
+        ctx.finish()
+    return run
+
+@benchmark('camera/rect/project')
+def rect_project(ctx, n):
+    camera = RectCamera([0, 0, 1, 1])
+    points = np.random.rand(n, 3)
+    return lambda: camera.project(points)
+
+@benchmark('camera/rect/unproject')
+def rect_unproject(ctx, n):
+    camera = RectCamera([0, 0, 1, 1])
+    points = np.random.rand(n, 3)
+    return lambda: camera.unproject(points)
+
+@benchmark('camera/rect/project_f4_out')
+def rect_project_out(ctx, n):
+    camera = RectCamera([0, 0, 1, 1])
+    points = np.random.rand(n, 2).astype('f4')
+    out = np.empty((n, 3), dtype='f4')
+    return lambda: camera.project(points, out=out)
+
+@benchmark('camera/arcball/project')
+def arcball_project(ctx, n):
+    camera = ArcballCamera((800, 600))
+    points = np.random.rand(n, 3)
+    return lambda: camera.project(points)
+
+def measure(setup: Callable, ctx, n: int, repeat: int) -> Dict[str, float]:
+    """Time repeat runs of a benchmark and trace the memory of the first one"""
+    run = setup(ctx, n)
+    run()  # warm up, e.g. create the buffers
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    return {
+        'size': n,
+        'best_s': best,
+        'median_s': float(np.median(times)),
+        'items_per_s': n / best if best > 0 else float('inf'),
+        'peak_bytes': peak,
+    }
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=float, nargs='+', default=DEFAULT_SIZES,
+        help='the data sizes (number of points, samples or voxels)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--backend', default=None, help="force a moderngl backend, e.g. 'egl'")
+    parser.add_argument('--json', default=None, help='write the results to this file')
+    args = parser.parse_args(argv)
+
+    ctx = create_headless_context(args.backend)
+    print(f"# {ctx.info['GL_RENDERER']}", file=sys.stderr)
+    print(f"{'benchmark':<34}{'size':>12}{'best ms':>12}{'items/s':>14}{'peak MiB':>10}")
+    results = []
+    for name, (setup, max_size) in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        for size in args.sizes:
+            if size > max_size:
+                continue
+            result = measure(setup, ctx, int(size), args.repeat)
+            result['name'] = name
+            results.append(result)
+            print(
+                f"{name:<34}{result['size']:>12.0e}{result['best_s'] * 1e3:>12.3f}"
+                f"{result['items_per_s']:>14.3g}{result['peak_bytes'] / 2**20:>10.1f}",
+                flush=True
+            )
+            gc.collect()
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
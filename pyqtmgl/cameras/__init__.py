@@ -1,4 +1,4 @@
-from pyqtmgl.cameras.camera import Camera
+from pyqtmgl.cameras.camera import Camera, transform
 from pyqtmgl.cameras.arcball import ArcballCamera
 from pyqtmgl.cameras.rect import RectCamera
 from pyqtmgl.cameras.screen import ScreenCamera
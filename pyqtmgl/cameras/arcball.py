@@ -4,7 +4,7 @@ from typing import Optional
 import glm
 import numpy as np
 
-from pyqtmgl.cameras.camera import Camera
+from pyqtmgl.cameras.camera import Camera, camera_property
 
 class CameraView(Enum):
     XY_POS = 0
@@ -15,6 +15,15 @@ class CameraView(Enum):
     YZ_NEG = 5
 
 class ArcballCamera(Camera):
+    fov = camera_property('fov', float, 'The vertical field of view in radians')
+    near = camera_property('near', float)
+    far = camera_property('far', float)
+    distance = camera_property('distance', float, 'The distance from the target')
+    target = camera_property('target', glm.vec3, 'The point orbited around')
+    forward = camera_property('forward', glm.vec3)
+    right = camera_property('right', glm.vec3)
+    up = camera_property('up', glm.vec3)
+
     def __init__(self, screen_size, fov=60.0, near=0.1, far=10.0):
         """
         Initialize the ArcballCamera.
@@ -27,7 +36,7 @@ class ArcballCamera(Camera):
         """
 
         self.fov = np.radians(fov)
-        self.screen_width, self.screen_height = screen_size
+        self.set_size(*screen_size)
         self.near = near
         self.far = far
 
@@ -43,11 +52,11 @@ class ArcballCamera(Camera):
 
     def save_defaults(self):
         self.defaults = {
-            'target': self.target,
+            'target': glm.vec3(self.target),
             'distance': self.distance,
-            'forward': self.forward,
-            'right': self.right,
-            'up': self.up,
+            'forward': glm.vec3(self.forward),
+            'right': glm.vec3(self.right),
+            'up': glm.vec3(self.up),
         }
 
     def reset(self):
@@ -153,12 +162,3 @@ class ArcballCamera(Camera):
         """
         zoom_speed = 0.01
         self.distance = max(0.1, self.distance + (delta_scroll * zoom_speed))
-
-    def get_matrices(self):
-        """
-        Get the current projection and view matrices.
-
-        Returns:
-        tuple: (projection_matrix, view_matrix)
-        """
-        return self._compute_projection_matrix(), self._compute_view_matrix()
\ No newline at end of file
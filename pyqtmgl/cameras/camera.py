@@ -1,36 +1,116 @@
-from typing import Tuple
+from typing import Optional, Tuple
 
 import glm
 import numpy as np
 
+def transform(matrix: np.ndarray, verts, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Apply a (4, 4) homogeneous transform to (N, 2) or (N, 3) vertices
+
+    The missing z is taken as 0 and w as 1 without padding the vertices.
+    The matrix is cast to the dtype of the result, so float32 vertices are
+    transformed in float32. Affine matrices are applied in place in out;
+    projective ones also need a temporary for w.
+
+    Parameters
+    ----------
+    matrix : np.ndarray (4, 4)
+        The transform, acting on column vectors
+    verts : np.ndarray (N, 2) or (N, 3)
+        The vertices
+    out : np.ndarray (N, 3)
+        Where to write the transformed vertices, divided by w
+    """
+    verts = np.asarray(verts)
+    if verts.ndim != 2 or verts.shape[1] not in (2, 3):
+        raise ValueError('Vertices must be of shape (N, 2) or (N, 3)')
+    if out is None:
+        dtype = verts.dtype if verts.dtype.kind == 'f' else np.float64
+        out = np.empty((verts.shape[0], 3), dtype=dtype)
+    elif out.shape != (verts.shape[0], 3):
+        raise ValueError(f'out must be of shape ({verts.shape[0]}, 3)')
+    matrix = matrix.astype(out.dtype, copy=False)
+    dims = verts.shape[1]
+    np.matmul(verts, matrix[:3, :dims].T, out=out)
+    out += matrix[:3, 3]
+    if not np.array_equal(matrix[3], (0, 0, 0, 1)):
+        w = verts @ matrix[3, :dims]
+        w += matrix[3, 3]
+        out /= w[:, None]
+    return out
+
+def camera_property(name: str, convert=None, doc: Optional[str] = None) -> property:
+    """A camera attribute, stored as _<name>, whose setter calls touch()
+
+    Parameters
+    ----------
+    name : str
+        The name of the attribute
+    convert : callable
+        Applied to the values assigned, e.g. glm.vec3 to store a copy
+    doc : str
+        The docstring of the property
+    """
+    private = '_' + name
+
+    def getter(self):
+        return getattr(self, private)
+
+    def setter(self, value):
+        setattr(self, private, value if convert is None else convert(value))
+        self.touch()
+
+    return property(getter, setter, doc=doc)
 
 class Camera:
-    def project(self, verts):
-        """Project vertices to NDS"""
-        projection, view = self.get_matrices()
-        mvp = np.array(projection * view)
-        verts = np.array(verts)
-        if verts.shape[1] == 2:
-            verts = np.hstack((verts, np.zeros((verts.shape[0], 1))))
-        if verts.shape[1] == 3:
-            verts = np.hstack((verts, np.ones((verts.shape[0], 1))))
-        verts = (mvp @ verts.T).T
-        verts = verts[:, :3] / verts[:, 3:]
-        return verts
-    def unproject(self, verts):
-        """Unproject vertices from NDS"""
-        projection, view = self.get_matrices()
-        mvp = np.array(projection * view)
-        inv_mvp = np.linalg.inv(mvp)
-        # mvp = np.array(projection * view)
-        verts = np.array(verts)
-        if verts.shape[1] == 2:
-            verts = np.hstack((verts, np.zeros((verts.shape[0], 1))))
-        if verts.shape[1] == 3:
-            verts = np.hstack((verts, np.ones((verts.shape[0], 1))))
-        verts = verts @ inv_mvp.T
-        verts = verts[:, :3] / verts[:, 3:]
-        return verts
+    # incremented by touch() whenever the camera changes, so the matrices,
+    # and their copies on the GPU, are only recomputed on change
+    version = 0
+    _matrices: Optional[Tuple[glm.mat4, glm.mat4]] = None
+    _mvp: Optional[Tuple[int, np.ndarray]] = None
+    _inverse_mvp: Optional[Tuple[int, np.ndarray]] = None
+
+    def touch(self):
+        """Flag the matrices as outdated
+
+        The setters of the camera attributes do this. glm values are
+        copied when assigned; call it after changing one in place, e.g.
+        camera.target.x = 1.
+        """
+        self._matrices = None
+        self.version += 1
+
+    def mvp(self) -> np.ndarray:
+        """The (4, 4) float64 projection * view matrix, cached until the camera changes"""
+        if self._mvp is None or self._mvp[0] != self.version:
+            projection, view = self.get_matrices()
+            self._mvp = self.version, np.array(projection * view, dtype=np.float64)
+        return self._mvp[1]
+
+    def inverse_mvp(self) -> np.ndarray:
+        """The inverse of mvp(), cached until the camera changes"""
+        if self._inverse_mvp is None or self._inverse_mvp[0] != self.version:
+            self._inverse_mvp = self.version, np.linalg.inv(self.mvp())
+        return self._inverse_mvp[1]
+
+    def project(self, verts, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Project vertices to NDS
+
+        Parameters
+        ----------
+        verts : np.ndarray (N, 2) or (N, 3)
+            The vertices, z being 0 if left out
+        out : np.ndarray (N, 3)
+            Where to write the result. By default a new array of the
+            dtype of verts (float64 unless it is a float array) is returned.
+        """
+        return transform(self.mvp(), verts, out)
+
+    def unproject(self, verts, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Unproject vertices from NDS
+
+        Takes the same arguments as project.
+        """
+        return transform(self.inverse_mvp(), verts, out)
 
     def set_size(self, width, height):
         """
@@ -40,8 +120,11 @@ class Camera:
         width (float): New screen width.
         height (float): New screen height.
         """
+        if (getattr(self, 'screen_width', None), getattr(self, 'screen_height', None)) == (width, height):
+            return
         self.screen_width = width
         self.screen_height = height
+        self.touch()
 
     def get_matrices(self) -> Tuple[glm.mat4, glm.mat4]:
         """
@@ -50,7 +133,9 @@ class Camera:
         Returns:
         tuple: (projection_matrix, view_matrix)
         """
-        return self._compute_projection_matrix(), self._compute_view_matrix()
+        if self._matrices is None:
+            self._matrices = self._compute_projection_matrix(), self._compute_view_matrix()
+        return self._matrices
 
     def _compute_projection_matrix(self) -> glm.mat4:
         raise NotImplementedError
@@ -16,6 +16,14 @@ class RectCamera(Camera):
             left, bottom, right, top
         """
         self.rect = rect
+    @property
+    def rect(self):
+        return self._rect
+    @rect.setter
+    def rect(self, rect):
+        # a tuple, so it cannot be changed in place behind the version's back
+        self._rect = tuple(float(v) for v in rect)
+        self.touch()
     def _compute_projection_matrix(self):
         return glm.ortho(self.rect[0], self.rect[2], self.rect[1], self.rect[3], -1, 1)
     def _compute_view_matrix(self):
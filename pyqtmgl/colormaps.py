@@ -0,0 +1,125 @@
+from typing import Dict, Union
+import weakref
+
+import moderngl
+import numpy as np
+
+LUT_SIZE = 256
+# the texture unit colormaps are bound to, clear of the units nodes use for data
+COLORMAP_UNIT = 1
+
+# (position, r, g, b) control points, linearly interpolated; the perceptual
+# maps are close approximations of their matplotlib namesakes
+COLORMAPS: Dict[str, np.ndarray] = {
+    'gray': np.array([
+        (0.0, 0.0, 0.0, 0.0),
+        (1.0, 1.0, 1.0, 1.0),
+    ]),
+    'viridis': np.array([
+        (0.0, 0.267004, 0.004874, 0.329415),
+        (0.125, 0.282623, 0.140926, 0.457517),
+        (0.25, 0.253935, 0.265254, 0.529983),
+        (0.375, 0.206756, 0.371758, 0.553117),
+        (0.5, 0.163625, 0.471133, 0.558148),
+        (0.625, 0.127568, 0.566949, 0.550556),
+        (0.75, 0.134692, 0.658636, 0.517649),
+        (0.875, 0.266941, 0.748751, 0.440573),
+        (0.9375, 0.565498, 0.842430, 0.262877),
+        (1.0, 0.993248, 0.906157, 0.143936),
+    ]),
+    'magma': np.array([
+        (0.0, 0.001462, 0.000466, 0.013866),
+        (0.125, 0.078815, 0.054184, 0.211667),
+        (0.25, 0.232077, 0.059889, 0.437695),
+        (0.375, 0.390384, 0.100379, 0.501864),
+        (0.5, 0.550287, 0.161158, 0.505719),
+        (0.625, 0.716387, 0.214982, 0.475290),
+        (0.75, 0.868793, 0.287728, 0.409303),
+        (0.875, 0.967671, 0.439703, 0.359810),
+        (0.9375, 0.994324, 0.624107, 0.427397),
+        (1.0, 0.987053, 0.991438, 0.749504),
+    ]),
+    'hot': np.array([
+        (0.0, 0.0, 0.0, 0.0),
+        (0.375, 1.0, 0.0, 0.0),
+        (0.75, 1.0, 1.0, 0.0),
+        (1.0, 1.0, 1.0, 1.0),
+    ]),
+    'jet': np.array([
+        (0.0, 0.0, 0.0, 0.5),
+        (0.125, 0.0, 0.0, 1.0),
+        (0.375, 0.0, 1.0, 1.0),
+        (0.625, 1.0, 1.0, 0.0),
+        (0.875, 1.0, 0.0, 0.0),
+        (1.0, 0.5, 0.0, 0.0),
+    ]),
+    'coolwarm': np.array([
+        (0.0, 0.229806, 0.298718, 0.753683),
+        (0.5, 0.865003, 0.865003, 0.865003),
+        (1.0, 0.705673, 0.015556, 0.149696),
+    ]),
+}
+
+Colormap = Union[str, np.ndarray]
+
+def colormap_lut(colormap: Colormap, size: int = LUT_SIZE) -> np.ndarray:
+    """Get the lookup table of a colormap
+
+    Parameters
+    ----------
+    colormap : str or np.ndarray (K, 3) or (K, 4)
+        The name of one of COLORMAPS, or K evenly spaced RGB(A) colors,
+        either floats from 0 to 1 or uint8
+    size : int
+        The number of entries of the table
+
+    Returns
+    -------
+    lut : np.ndarray (size, 4)
+        The RGBA colors as uint8
+    """
+    t = np.linspace(0, 1, size)
+    if isinstance(colormap, str):
+        if colormap not in COLORMAPS:
+            raise ValueError(f'Colormap must be one of {tuple(COLORMAPS)} or an array')
+        points = COLORMAPS[colormap]
+        rgb = np.stack([np.interp(t, points[:, 0], points[:, i]) for i in (1, 2, 3)], axis=1)
+        return np.concatenate([np.round(rgb * 255), np.full((size, 1), 255)], axis=1).astype(np.uint8)
+    colors = np.asarray(colormap)
+    if colors.ndim != 2 or colors.shape[1] not in (3, 4) or len(colors) == 0:
+        raise ValueError('Colormap arrays must be of shape (K, 3) or (K, 4)')
+    colors = colors / 255 if colors.dtype == np.uint8 else colors.astype('f8')
+    if colors.shape[1] == 3:
+        colors = np.concatenate([colors, np.ones((len(colors), 1))], axis=1)
+    if len(colors) == size:
+        lut = colors
+    else:
+        positions = np.linspace(0, 1, len(colors))
+        lut = np.stack([np.interp(t, positions, colors[:, i]) for i in range(4)], axis=1)
+    return np.round(np.clip(lut, 0, 1) * 255).astype(np.uint8)
+
+_TEXTURES: 'weakref.WeakKeyDictionary[moderngl.Context, Dict[bytes, moderngl.Texture]]' = weakref.WeakKeyDictionary()
+
+def colormap_texture(ctx: moderngl.Context, colormap: Colormap) -> moderngl.Texture:
+    """Get the (LUT_SIZE, 1) RGBA texture of a colormap, built once per context"""
+    lut = colormap_lut(colormap)
+    textures = _TEXTURES.setdefault(ctx, {})
+    key = lut.tobytes()
+    if key not in textures:
+        texture = ctx.texture((len(lut), 1), 4, key)
+        texture.filter = moderngl.LINEAR, moderngl.LINEAR
+        texture.repeat_x = texture.repeat_y = False
+        textures[key] = texture
+    return textures[key]
+
+def label_palette(n: int) -> np.ndarray:
+    """Distinct RGBA uint8 colors of the labels 0 to n-1, label 0 transparent
+
+    Consecutive labels are spread along the jet colormap by the golden
+    ratio so that neighbouring regions get contrasting colors.
+    """
+    lut = colormap_lut('jet')
+    positions = (np.arange(n) * 0.618033988749895) % 1.0
+    colors = lut[np.round(positions * (len(lut) - 1)).astype(int)]
+    colors[:1, 3] = 0
+    return colors
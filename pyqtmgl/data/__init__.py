@@ -0,0 +1,3 @@
+from pyqtmgl.data.sources import DataSource, ArraySource, RawFileSource
+from pyqtmgl.data.pyramid import MinMaxPyramid
+from pyqtmgl.data.grid import GridIndex
@@ -0,0 +1,114 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+# the average number of points per occupied cell the grid is sized for
+DEFAULT_POINTS_PER_CELL = 4
+
+class GridIndex:
+    def __init__(self, points: np.ndarray, points_per_cell: int = DEFAULT_POINTS_PER_CELL):
+        """Uniform grid over the x and y coordinates of points
+
+        The points are sorted by cell, so the points of a row of cells are
+        one contiguous slice and a query only looks at the cells its box
+        overlaps. Building costs one sort, a query about the number of
+        points near the box.
+
+        Parameters
+        ----------
+        points : np.ndarray (N, 2+)
+            The points to index. Only the first two columns are used.
+        points_per_cell : int
+            The average number of points per cell
+        """
+        self.points = points
+        xy = np.asarray(points[:, :2], dtype='f8')
+        finite = np.isfinite(xy).all(axis=1)
+        if not finite.all():
+            valid = np.flatnonzero(finite)
+            xy = xy[valid]
+        else:
+            valid = None
+        n = xy.shape[0]
+        self.n_cells = max(1, int(np.sqrt(n / points_per_cell)))
+        if n:
+            self.lo = xy.min(axis=0)
+            extent = xy.max(axis=0) - self.lo
+        else:
+            self.lo = np.zeros(2)
+            extent = np.zeros(2)
+        # a degenerate axis still gets a non-zero cell size
+        self.cellsize = np.where(extent > 0, extent, 1.0) / self.n_cells
+
+        cells = self._cell(xy)
+        cell = cells[:, 1] * self.n_cells + cells[:, 0]
+        order = np.argsort(cell)
+        self.order = order if valid is None else valid[order]
+        self.xy = xy[order]
+        # starts[c]:starts[c + 1] is the slice of self.order in cell c
+        counts = np.bincount(cell, minlength=self.n_cells ** 2)
+        self.starts = np.concatenate([[0], np.cumsum(counts)])
+
+    def _cell(self, xy: np.ndarray) -> np.ndarray:
+        cells = np.floor((xy - self.lo) / self.cellsize).astype(np.intp)
+        return np.clip(cells, 0, self.n_cells - 1)
+
+    def query(self, lo, hi) -> np.ndarray:
+        """Get the rows of the points that may lie in the box [lo, hi]
+
+        The candidates are every point of the cells the box overlaps, so
+        they still need to be filtered by exact distance.
+
+        Parameters
+        ----------
+        lo, hi : Sequence[float] of length 2
+            The bottom left and top right corners of the box
+
+        Returns
+        -------
+        candidates : np.ndarray (K,)
+            Positions into self.xy, which holds the sorted coordinates
+        """
+        lo = np.asarray(lo, dtype='f8')
+        hi = np.asarray(hi, dtype='f8')
+        top = self.lo + self.cellsize * self.n_cells
+        if (hi < self.lo).any() or (lo > top).any():
+            return np.zeros(0, dtype=np.int64)
+        (x0, y0), (x1, y1) = self._cell(np.stack([lo, hi]))
+        rows = np.arange(y0, y1 + 1) * self.n_cells
+        starts = self.starts[rows + x0]
+        stops = self.starts[rows + x1 + 1]
+        if len(rows) == 1:
+            return np.arange(starts[0], stops[0])
+        return np.concatenate([np.arange(a, b) for a, b in zip(starts, stops)])
+
+    def nearest(self, xy, radius) -> Optional[Tuple[int, float]]:
+        """Find the closest point within an axis-aligned ellipse
+
+        Parameters
+        ----------
+        xy : Sequence[float] of length 2
+            The centre of the search
+        radius : Sequence[float] of length 2
+            The x and y radii of the ellipse. Distances are measured in
+            units of these radii, so a view's pixel size can be passed to
+            get distances in pixels.
+
+        Returns
+        -------
+        index : int
+            The row of the point in the indexed points
+        distance : float
+            Its distance in units of radius, at most 1
+        None is returned if there is no point within the ellipse.
+        """
+        xy = np.asarray(xy, dtype='f8')
+        radius = np.asarray(radius, dtype='f8')
+        candidates = self.query(xy - radius, xy + radius)
+        if candidates.size == 0:
+            return None
+        d = np.hypot(*((self.xy[candidates] - xy) / radius).T)
+        best = int(np.argmin(d))
+        if d[best] > 1:
+            return None
+        return int(self.order[candidates[best]]), float(d[best])
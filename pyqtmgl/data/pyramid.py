@@ -0,0 +1,190 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from pyqtmgl.data.sources import as_source
+
+DEFAULT_FACTOR = 4
+DEFAULT_CHUNKSIZE = 2**20
+
+def minmax_pairs(blocks: np.ndarray) -> np.ndarray:
+    """Reduce the last axis of blocks to its minimum and maximum
+
+    Parameters
+    ----------
+    blocks : np.ndarray (..., K)
+        The blocks to reduce
+
+    Returns
+    -------
+    pairs : np.ndarray (..., 2)
+        The minimum and maximum of each block, in the order in which they
+        occur so that a line drawn through the pairs keeps the shape of the
+        original trace
+    """
+    imin = blocks.argmin(axis=-1)[..., None]
+    imax = blocks.argmax(axis=-1)[..., None]
+    lo = np.take_along_axis(blocks, imin, axis=-1)
+    hi = np.take_along_axis(blocks, imax, axis=-1)
+    min_first = imin <= imax
+    return np.concatenate(
+        [
+            np.where(min_first, lo, hi),
+            np.where(min_first, hi, lo)
+        ],
+        axis=-1
+    )
+
+def _reduce(values: np.ndarray, size: int) -> np.ndarray:
+    """Split (C, N) values into blocks of size and reduce each to a min/max pair"""
+    pad = (-values.shape[1]) % size
+    if pad:
+        values = np.pad(values, ((0, 0), (0, pad)), mode='edge')
+    return minmax_pairs(values.reshape(values.shape[0], -1, size))
+
+class MinMaxPyramid:
+    def __init__(self, 
+        data,
+        factor: int = DEFAULT_FACTOR,
+        chunksize: int = DEFAULT_CHUNKSIZE,
+        min_level: int = 1,
+        max_level: Optional[int] = None
+    ):
+        """Multi-resolution min/max decimation of multichannel traces
+
+        Level k holds, for every block of factor**k samples, the minimum and
+        maximum of the block in chronological order. Drawing those pairs at
+        one block per pixel column is visually identical to drawing the raw
+        samples (M4 aggregation), so the number of vertices depends on the
+        width of the view rather than on the number of samples it spans.
+
+        Parameters
+        ----------
+        data : array-like (C, N) or DataSource
+            The traces. They are read in chunks of chunksize samples while
+            building the pyramid, and again for views finer than min_level.
+        factor : int
+            The decimation factor between consecutive levels
+        chunksize : int
+            The number of samples read at a time while building
+        min_level : int
+            The finest level kept in memory. The levels hold about
+            2 / factor**min_level values per sample, so out-of-core sources
+            should use a coarser min_level.
+        max_level : int
+            The coarsest level built. If 0, nothing is built and every query
+            reduces the raw samples in view.
+        """
+        if factor < 2:
+            raise ValueError('Factor must be at least 2')
+        if min_level < 1:
+            raise ValueError('Min level must be at least 1')
+        self.source = as_source(data)
+        self.factor = factor
+        self.min_level = min_level
+        self.n_channels, self.n_samples = self.source.shape
+
+        # levels[k - min_level] has shape (C, ceil(N / factor**k), 2)
+        self.levels: List[np.ndarray] = []
+        if max_level is None:
+            max_level = int(np.ceil(np.log(max(self.n_samples, 1)) / np.log(factor)))
+        if max_level < min_level or self.n_samples <= factor ** min_level:
+            return
+        size = factor ** min_level
+        chunksize = max(size, chunksize - chunksize % size)
+        level = np.concatenate(
+            [
+                _reduce(self.source.read(start, start + chunksize), size)
+                for start in range(0, self.n_samples, chunksize)
+            ],
+            axis=1
+        )
+        self.levels.append(level)
+        while level.shape[1] > 1 and len(self.levels) <= max_level - min_level:
+            level = _reduce(level.reshape(self.n_channels, -1), 2 * factor)
+            self.levels.append(level)
+
+    @property
+    def max_level(self) -> int:
+        """The coarsest level built, or 0 if there are none"""
+        return self.min_level + len(self.levels) - 1 if self.levels else 0
+
+    def range(self) -> Tuple[float, float]:
+        """The minimum and maximum of the traces
+
+        Exact when the pyramid was built to its top, sampled otherwise.
+        """
+        if self.levels and self.levels[-1].shape[1] == 1:
+            return float(self.levels[-1].min()), float(self.levels[-1].max())
+        return self.source.estimate_range()
+
+    def min(self) -> float:
+        return self.range()[0]
+
+    def max(self) -> float:
+        return self.range()[1]
+
+    def query(self, start: int, stop: int, n_pixels: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the vertices needed to draw samples [start, stop) over n_pixels columns
+
+        Parameters
+        ----------
+        start, stop : int
+            The range of samples in view
+        n_pixels : int
+            The width of the view in pixels
+
+        Returns
+        -------
+        x : np.ndarray (V,)
+            The sample position of each vertex
+        y : np.ndarray (C, V)
+            The value of each vertex for each channel. V is at most about
+            two per pixel column.
+        """
+        start = max(0, int(start))
+        stop = min(self.n_samples, int(stop))
+        n_pixels = max(1, int(n_pixels))
+        samples_per_pixel = (stop - start) / n_pixels
+        if samples_per_pixel <= 2:
+            return np.arange(start, stop, dtype='f8'), self.source.read(start, stop)
+
+        # the coarsest level whose blocks are at most a fraction of a pixel
+        # column wide, so blocks straddling two columns shift extremes by
+        # less than a pixel
+        k = int(np.log(samples_per_pixel) / np.log(self.factor)) - 1
+        k = min(max(k, 0), self.max_level)
+        if k < self.min_level:
+            k = 0
+        size = self.factor ** k
+        first = start // size
+        last = -(-stop // size)
+        if k == 0:
+            values = self.source.read(first, last)
+            position = np.arange(first, last) + 0.5
+        else:
+            values = self.levels[k - self.min_level][:, first:last].reshape(self.n_channels, -1)
+            position = np.repeat(np.arange(first, last) + 0.5, 2) * size
+
+        # merge the blocks falling in each pixel column into a min/max pair
+        column = np.clip(((position - start) // samples_per_pixel).astype(int), 0, n_pixels - 1)
+        bounds = np.flatnonzero(np.diff(column, prepend=-1))
+        counts = np.diff(bounds, append=column.size)
+        order = np.arange(column.size)
+        pairs = []
+        for reduce in (np.minimum, np.maximum):
+            extreme = reduce.reduceat(values, bounds, axis=1)
+            at_extreme = values == np.repeat(extreme, counts, axis=1)
+            index = np.minimum.reduceat(np.where(at_extreme, order, column.size), bounds, axis=1)
+            pairs.append((extreme, index))
+        (lo, imin), (hi, imax) = pairs
+        min_first = imin <= imax
+        y = np.stack(
+            [
+                np.where(min_first, lo, hi),
+                np.where(min_first, hi, lo)
+            ],
+            axis=2
+        )
+        x = start + (column[bounds] + 0.5) * samples_per_pixel
+        return np.repeat(x, 2), y.reshape(self.n_channels, -1)
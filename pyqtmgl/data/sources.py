@@ -0,0 +1,129 @@
+import os
+from typing import Literal, Tuple
+
+import numpy as np
+
+class DataSource:
+    """Multichannel samples that are read a chunk at a time
+
+    Subclasses set n_channels, n_samples and dtype and implement read.
+    """
+    n_channels: int
+    n_samples: int
+    dtype: np.dtype
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.n_channels, self.n_samples
+
+    def read(self, start: int, stop: int) -> np.ndarray:
+        """Read samples [start, stop) of every channel
+
+        Returns
+        -------
+        samples : np.ndarray (n_channels, stop - start)
+        """
+        raise NotImplementedError
+
+    def estimate_range(self, n_blocks: int = 64, blocksize: int = 1024) -> Tuple[float, float]:
+        """Estimate the minimum and maximum from evenly spaced blocks
+
+        Parameters
+        ----------
+        n_blocks : int
+            The number of blocks to read
+        blocksize : int
+            The number of samples per block
+
+        Returns
+        -------
+        min, max : float
+            The range of the blocks read. If they cover the whole source,
+            this is the exact range.
+        """
+        if n_blocks * blocksize >= self.n_samples:
+            samples = self.read(0, self.n_samples)
+            return float(samples.min()), float(samples.max())
+        starts = np.linspace(0, self.n_samples - blocksize, n_blocks).astype(int)
+        lo, hi = np.inf, -np.inf
+        for start in starts:
+            samples = self.read(start, start + blocksize)
+            lo = min(lo, float(samples.min()))
+            hi = max(hi, float(samples.max()))
+        return lo, hi
+
+class ArraySource(DataSource):
+    def __init__(self, data):
+        """Source backed by an array already in memory
+
+        Parameters
+        ----------
+        data : array-like (n_channels, n_samples)
+            The samples
+        """
+        self.data = np.asarray(data)
+        if self.data.ndim == 1:
+            self.data = self.data[None, :]
+        if self.data.ndim != 2:
+            raise ValueError('Data must be of shape (n_channels, n_samples)')
+        self.n_channels, self.n_samples = self.data.shape
+        self.dtype = self.data.dtype
+
+    def read(self, start: int, stop: int) -> np.ndarray:
+        return self.data[:, start:stop]
+
+    def estimate_range(self, n_blocks: int = 64, blocksize: int = 1024) -> Tuple[float, float]:
+        return float(self.data.min()), float(self.data.max())
+
+class RawFileSource(DataSource):
+    def __init__(self, 
+        path: str,
+        dtype,
+        n_channels: int,
+        layout: Literal['interleaved', 'contiguous'] = 'interleaved',
+        offset: int = 0
+    ):
+        """Source backed by a memory-mapped headerless binary file
+
+        Only the pages holding the samples that are read are loaded, so the
+        file can be much larger than the available memory.
+
+        Parameters
+        ----------
+        path : str
+            The path to the file
+        dtype : np.dtype
+            The type of each sample, e.g. 'i2'
+        n_channels : int
+            The number of channels
+        layout : str
+            'interleaved' if the file holds one sample of every channel
+            after the other (n_samples, n_channels), 'contiguous' if it
+            holds all samples of one channel after the other
+            (n_channels, n_samples)
+        offset : int
+            The number of header bytes to skip
+        """
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.n_channels = n_channels
+        self.layout = layout
+        self.n_samples = (os.path.getsize(path) - offset) // (self.dtype.itemsize * n_channels)
+        if layout == 'interleaved':
+            shape = (self.n_samples, n_channels)
+        elif layout == 'contiguous':
+            shape = (n_channels, self.n_samples)
+        else:
+            raise ValueError("Layout must be 'interleaved' or 'contiguous'")
+        self.memmap = np.memmap(path, dtype=self.dtype, mode='r', offset=offset, shape=shape)
+
+    def read(self, start: int, stop: int) -> np.ndarray:
+        if self.layout == 'interleaved':
+            return np.ascontiguousarray(self.memmap[start:stop].T)
+        return np.asarray(self.memmap[:, start:stop])
+
+def as_source(data) -> DataSource:
+    """Wrap data in an ArraySource unless it already is a DataSource"""
+    if isinstance(data, DataSource):
+        return data
+    return ArraySource(data)
@@ -1,19 +1,45 @@
-from typing import Sequence
+from typing import Optional, Sequence, Tuple, Type
 from pyqtmgl.cameras.screen import ScreenCamera
 from pyqtmgl.nodes.node import Node
+from pyqtmgl.nodes.programs import acquire_program, release_program
 from pyqtmgl.cameras import Camera
+from pyqtmgl.picking import PickBuffer
+from pyqtmgl.profiling import DEFAULT_WINDOW, Profiler
 
 import moderngl
-from PyQt5.QtWidgets import QOpenGLWidget, QToolTip
-from PyQt5.QtGui import QSurfaceFormat
+from PyQt5.QtCore import QElapsedTimer, QTimer
+from PyQt5.QtWidgets import QLabel, QOpenGLWidget, QToolTip
+from PyQt5.QtGui import QGuiApplication, QSurfaceFormat
 
 class GLWidget(QOpenGLWidget):
+    # node classes whose programs are compiled up front in initializeGL
+    PREWARM_NODES: Sequence[Type[Node]] = ()
+    # the minimum time between refreshes of the profiling overlay
+    OVERLAY_INTERVAL_MS = 500
+    # the frame rate used when the screen does not report one
+    DEFAULT_REFRESH_RATE = 60.0
+
     def __init__(self):
         super().__init__()
         self.ctx = None
+        self._prewarmed = []
+        self._pick_buffer: Optional[PickBuffer] = None
+        self.profiler: Optional[Profiler] = None
+        self._overlay: Optional[QLabel] = None
+        self._overlay_timer = QElapsedTimer()
         self.screen = None
         self.bg = (0.0, 0.0, 0.0, 1.0)
 
+        # update() requests are merged into one repaint per display refresh
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.timeout.connect(self._request_paint)
+        self._last_frame = QElapsedTimer()
+        # the scene_state of the frame on screen, None to draw the next one
+        self._drawn_state = None
+        # keep the framebuffer between frames so unchanged frames can be skipped
+        self.setUpdateBehavior(QOpenGLWidget.PartialUpdate)
+
         fmt = QSurfaceFormat()
         fmt.setVersion(4, 3)
         fmt.setProfile(QSurfaceFormat.OpenGLContextProfile.CoreProfile)
@@ -30,24 +56,166 @@ class GLWidget(QOpenGLWidget):
         return []
 
     def initializeGL(self) -> None:
+        self._drawn_state = None
         self.ctx = moderngl.create_context()
         self.screen_camera = ScreenCamera(self.width(), self.height())
+        self.context().aboutToBeDestroyed.connect(self.release_context)
+        self._prewarmed = [
+            acquire_program(self.ctx, cls.VERTEX, cls.FRAGMENT, cls.GEOMETRY)
+            for cls in self.PREWARM_NODES
+        ]
         self.init()
 
+    def release_context(self) -> None:
+        """Release the GPU resources of every node before the context goes away
+
+        The nodes keep their data and are re-attached by update_context when
+        a new context is initialized.
+        """
+        self.makeCurrent()
+        for node in self.nodes:
+            if node is not None and node.ctx is not None:
+                node.release()
+        for entry in self._prewarmed:
+            release_program(self.ctx, entry)
+        self._prewarmed = []
+        if self._pick_buffer is not None:
+            self._pick_buffer.release()
+            self._pick_buffer = None
+        self.doneCurrent()
+
     def update_context(self) -> None:
         for node in self.nodes:
             if node is not None and node.ctx is None:
                 node.set_context(self.ctx)
 
+    def update(self, *args) -> None:
+        """Schedule a repaint
+
+        Requests are merged so that at most one frame is drawn per display
+        refresh, however often this is called. Calls with a region are
+        passed on to Qt as is.
+        """
+        if args:
+            return super().update(*args)
+        if self._frame_timer.isActive():
+            return
+        interval = 1000.0 / self.refresh_rate()
+        elapsed = self._last_frame.elapsed() if self._last_frame.isValid() else interval
+        self._frame_timer.start(max(0, int(interval - elapsed)))
+
+    def _request_paint(self) -> None:
+        self._last_frame.start()
+        QOpenGLWidget.update(self)
+
+    def redraw(self) -> None:
+        """Schedule a repaint that draws even if scene_state is unchanged"""
+        self._drawn_state = None
+        self.update()
+
+    def refresh_rate(self) -> float:
+        screen = QGuiApplication.primaryScreen()
+        if self.window().windowHandle() is not None:
+            screen = self.window().windowHandle().screen()
+        rate = screen.refreshRate() if screen is not None else 0
+        return rate if rate > 0 else self.DEFAULT_REFRESH_RATE
+
+    def scene_state(self) -> tuple:
+        """A snapshot of everything that affects the drawing
+
+        Frames are only drawn when it differs from the frame on screen.
+        Widgets whose render depends on more than their nodes, cameras and
+        background extend it.
+        """
+        return (
+            tuple(None if node is None else (id(node), node.version) for node in self.nodes),
+            tuple(None if camera is None else (id(camera), camera.version) for camera in self.cameras),
+            tuple(self.bg),
+        )
+
     def paintGL(self) -> None:
         self.update_context()
+        state = self.scene_state()
+        if state == self._drawn_state:
+            # the framebuffer still holds this frame
+            return
+        self._drawn_state = state
         self.screen = self.ctx.detect_framebuffer(self.defaultFramebufferObject())
         self.screen.use()
         self.makeCurrent()
         self.ctx.clear(*self.bg)
+        if self.profiler is None:
+            self.render()
+            return
+        # profiling may have been enabled before the context existed
+        self.profiler.ctx = self.ctx
+        for node in self.nodes:
+            if node is not None:
+                self.profiler.attach(node)
+        self.profiler.begin_frame()
         self.render()
+        self.profiler.end_frame()
+        self.update_overlay()
+
+    def enable_profiling(self, overlay: bool = False, window: int = DEFAULT_WINDOW) -> Profiler:
+        """Start timing every node drawn by this widget
+
+        Parameters
+        ----------
+        overlay : bool
+            Whether to show the frame rate and the most costly nodes on top
+            of the widget
+        window : int
+            The number of frames the statistics are kept over
+
+        Returns
+        -------
+        profiler : Profiler
+            The profiler holding the statistics, also kept as self.profiler
+        """
+        if self.profiler is None:
+            self.profiler = Profiler(self.ctx, window)
+        if overlay and self._overlay is None:
+            self._overlay = QLabel(self)
+            self._overlay.setStyleSheet(
+                'background-color: rgba(0, 0, 0, 160); color: white; font-family: monospace; padding: 4px;'
+            )
+            self._overlay.move(0, 0)
+            self._overlay.show()
+            self._overlay_timer.invalidate()
+        elif not overlay and self._overlay is not None:
+            self._overlay.deleteLater()
+            self._overlay = None
+        self.redraw()
+        return self.profiler
+
+    def disable_profiling(self) -> None:
+        """Stop timing the nodes and remove the overlay"""
+        if self.profiler is not None:
+            self.profiler.detach_all()
+            self.profiler = None
+        if self._overlay is not None:
+            self._overlay.deleteLater()
+            self._overlay = None
+
+    def profiling_stats(self) -> dict:
+        """The rolling statistics of each node, see Profiler.summary"""
+        if self.profiler is None:
+            raise ValueError("Profiling is not enabled")
+        return self.profiler.summary()
+
+    def update_overlay(self) -> None:
+        if self._overlay is None or self.profiler is None:
+            return
+        if self._overlay_timer.isValid() and self._overlay_timer.elapsed() < self.OVERLAY_INTERVAL_MS:
+            return
+        self._overlay_timer.start()
+        self._overlay.setText(self.profiler.report())
+        self._overlay.adjustSize()
 
     def resizeGL(self, w: int, h: int) -> None:
+        # the framebuffer is re-created, so the next frame must be drawn
+        self._drawn_state = None
         self.ctx.viewport = (0, 0, w, h)
         for node in self.nodes:
             if node is not None:
@@ -62,6 +230,48 @@ class GLWidget(QOpenGLWidget):
     def render(self) -> None:
         pass
 
+    def pick_at(self, pos, radius: int = 3, camera: Optional[Camera] = None) -> Optional[Tuple[Node, int]]:
+        """Find the node and point drawn under a position on the widget
+
+        The nodes are drawn offscreen as ids rather than colors and only the
+        pixels around pos are read back, so this works in 3D and costs the
+        same whatever the number of points.
+
+        Parameters
+        ----------
+        pos : QPoint or Tuple[int, int]
+            The position in widget pixels
+        radius : int
+            The half-width in pixels of the square searched around pos
+        camera : Camera
+            The camera the nodes are drawn with. Defaults to the first of
+            self.cameras.
+
+        Returns
+        -------
+        node : Node
+            The node drawn closest to pos
+        index : int
+            The index of the point of the node
+        None is returned if nothing is drawn within radius.
+        """
+        if self.ctx is None:
+            raise ValueError("Context not initialized")
+        if camera is None:
+            camera = self.cameras[0]
+        if not isinstance(pos, tuple):
+            pos = (pos.x(), pos.y())
+        self.makeCurrent()
+        try:
+            self.update_context()
+            if self._pick_buffer is None:
+                self._pick_buffer = PickBuffer(self.ctx)
+            return self._pick_buffer.pick(
+                self.nodes, camera, (self.width(), self.height()), pos, radius
+            )
+        finally:
+            self.doneCurrent()
+
     def set_tooltip(self, text: str, pos):
         QToolTip.showText(self.mapToGlobal(pos), text, self)
     
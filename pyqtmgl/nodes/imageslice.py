@@ -1,17 +1,59 @@
-from typing import Optional
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Tuple
+import weakref
 
 import moderngl
 import numpy as np
 import glm
 
+from pyqtmgl.colormaps import COLORMAP_UNIT, Colormap, colormap_lut, label_palette
 from pyqtmgl.nodes.node import Node
-from pyqtmgl.cameras.camera import Camera
+
+# the texture unit of the label colors; the volume is on 0, the colormap on COLORMAP_UNIT
+LABEL_UNIT = 2
+# slices read around the one displayed in lazy mode, and the slices kept
+PREFETCH_SLICES = 2
+SLICE_CACHE_SIZE = 8
+
+_PREFETCHER: Optional[ThreadPoolExecutor] = None
+
+def slice_prefetcher() -> ThreadPoolExecutor:
+    """Get the thread slices of lazy volumes are read ahead in"""
+    global _PREFETCHER
+    if _PREFETCHER is None:
+        _PREFETCHER = ThreadPoolExecutor(max_workers=1)
+    return _PREFETCHER
+
+def read_slice(im, axis: int, index: int) -> np.ndarray:
+    """Read the 2D slice of an array-like volume as float32"""
+    key = [np.s_[:]] * 3
+    key[axis] = index
+    return np.asarray(im[tuple(key)], dtype='f4')
+
+_QUAD_BUFFERS = weakref.WeakKeyDictionary()
+
+def quad_buffers(ctx: moderngl.Context) -> Tuple[moderngl.Buffer, moderngl.Buffer]:
+    """Get the vertex and index buffers of the unit quad, built once per context"""
+    if ctx not in _QUAD_BUFFERS:
+        l, r, b, t = -1, 1, -1, 1
+        data = np.array([
+            l, b, 0, 0,
+            r, b, 1, 0,
+            r, t, 1, 1,
+            l, t, 0, 1
+        ], dtype='f4')
+        indices = np.array([0, 1, 2, 0, 2, 3], dtype='i4')
+        _QUAD_BUFFERS[ctx] = ctx.buffer(data), ctx.buffer(indices)
+    return _QUAD_BUFFERS[ctx]
 
 class ImageSlice(Node):
     VERTEX="""
     #version 330
-    uniform mat4 projection;
-    uniform mat4 view;
+    layout(std140) uniform Camera {
+        mat4 projection;
+        mat4 view;
+    };
     uniform mat4 model;
     in vec3 position;
     in vec2 uv;
@@ -27,6 +69,9 @@ class ImageSlice(Node):
     uniform float min_val;
     uniform float max_val;
     uniform sampler3D im;
+    uniform sampler2D colormap;
+    uniform bool labels;
+    uniform sampler2D label_colors;
     uniform int dimension;
     uniform int slice;
     uniform mat4 affine;
@@ -48,10 +93,29 @@ class ImageSlice(Node):
         coord /= scale;
         float val = texture(im, coord).r;
 
+        if (labels) {
+            // the volume is sampled without filtering, so val is a label
+            int label = int(round(val));
+            if (label < 0 || label >= textureSize(label_colors, 0).x) {
+                discard;
+            }
+            color = texelFetch(label_colors, ivec2(label, 0), 0);
+            if (color.a <= 0.0) {
+                discard;
+            }
+            return;
+        }
         float norm_val = clamp((val - min_val) / (max_val - min_val), 0.0, 1.0);
-        color = vec4(vec3(norm_val), 1.0);
+        float n = float(textureSize(colormap, 0).x);
+        color = textureLod(colormap, vec2((norm_val * (n - 1.0) + 0.5) / n, 0.5), 0.0);
     }
     """
+    # the fragment shader of lazy mode, sampling the slice uploaded as a 2D texture
+    SLICE_FRAGMENT = FRAGMENT.replace('uniform sampler3D im;', 'uniform sampler2D im;').replace(
+        FRAGMENT[FRAGMENT.index('        vec3 coord;'):FRAGMENT.index('        float val')],
+        ''
+    ).replace('texture(im, coord)', 'texture(im, f_uv)')
+    PICK_FRAGMENT = None
     REQUIRES_INDICES = True
     DRAW_MODE = moderngl.TRIANGLES
     CTX_FLAGS = moderngl.DEPTH_TEST | moderngl.BLEND
@@ -63,7 +127,12 @@ class ImageSlice(Node):
         min_val: Optional[float] = None,
         max_val: Optional[float] = None,
         dimension: Optional[int] = 0,
-        slice: Optional[int] = None
+        slice: Optional[int] = None,
+        colormap: Colormap = 'gray',
+        labels: bool = False,
+        label_colors: Optional[np.ndarray] = None,
+        label_visible: Optional[np.ndarray] = None,
+        lazy: bool = False
     ):
         """Image Slice primitive
 
@@ -82,6 +151,31 @@ class ImageSlice(Node):
             The dimension to slice along
         slice: int
             The slice to render
+        colormap : str or np.ndarray (K, 3|4)
+            The colormap the values between min_val and max_val are drawn
+            with, see pyqtmgl.colormaps
+        labels : bool
+            Draw the image as a label map: every voxel is an integer label
+            drawn in its color of label_colors, without interpolation
+        label_colors : np.ndarray (N_LABELS, 3|4)
+            The RGB(A) color of each label, floats from 0 to 1 or uint8.
+            Defaults to distinct colors with label 0 transparent.
+        label_visible : np.ndarray (N_LABELS,) of bool
+            Whether each label is drawn
+        lazy : bool
+            Read and upload only the displayed slice, as a 2D texture. im
+            may then be any array-like of 3 dimensions that can be sliced,
+            e.g. a memmap or a lazily loaded NIfTI image, and is never
+            loaded whole: changing the slice reads one slice, the slices
+            around it being read ahead in the background. The slices are
+            those of the 3D mode, but affines are not supported. Unless
+            given, min_val and max_val are the range of the first slice
+            read.
+
+        The window and level, the colormap and the label colors and
+        visibility are uniforms or a small texture: changing them never
+        uploads the volume again. update_variables also accepts window and
+        level, which set min_val and max_val to level -/+ window / 2.
         """
         super().__init__(ctx, 'ImageSlice')
 
@@ -91,7 +185,13 @@ class ImageSlice(Node):
         #     alphas = np.ones(points.shape[0])
 
         self.variables = {}
+        self.texture: Optional[moderngl.Texture] = None
+        self.label_texture: Optional[moderngl.Texture] = None
         self.width = self.height = None
+        self.colormap = colormap
+        self.lazy = False
+        self.slices: 'OrderedDict[Tuple[int, int], Future]' = OrderedDict()
+        self._slice_key: Optional[Tuple[int, int]] = None
 
         self.update_variables(
             # points=points, 
@@ -100,27 +200,50 @@ class ImageSlice(Node):
             min_val=min_val,
             max_val=max_val,
             dimension=dimension,
-            slice=slice
+            slice=slice,
+            labels=labels,
+            label_colors=label_colors,
+            label_visible=label_visible,
+            lazy=lazy
         )
 
     def update_variables(self, **kwargs):
+        self.touch()
         im = kwargs.pop('im', None)
+        lazy = kwargs.pop('lazy', None)
+        if lazy is not None and bool(lazy) != self.lazy:
+            self._set_lazy(bool(lazy))
+            if im is None:
+                im = self.variables.get('im')
 
-        if im is not None:
-            
-            self.variables['im'] = im = im.astype('f4')
-            self.texture = self.ctx.texture3d(
-                im.shape,
-                1,
-                im.tobytes(),
-                dtype='f4',
-            )
-            self.texture.use(0)
+        if im is not None and self.lazy:
+            if len(im.shape) != 3:
+                raise ValueError('Lazy volumes must have 3 dimensions')
+            self.variables['im'] = im
+            self.clear_slices()
+            # the range is taken from the first slice read, the largest
+            # label from every slice shown
+            self.variables.pop('im_min', None)
+            self.variables.pop('im_max', None)
+            self.variables.pop('label_max', None)
+            self.mark_dirty('im', 'label_colors')
+            self.update_model_matrix()
+        elif im is not None:
+            self.variables['im'] = im = np.asarray(im, dtype='f4')
+            # the intensity range is only needed when min_val/max_val are
+            # unset, but scanning the volume at draw time is far too costly
+            self.variables['im_min'] = float(im.min())
+            self.variables['im_max'] = float(im.max())
+            self.variables['label_max'] = self.variables['im_max']
+            # the default label colors depend on the largest label
+            self.mark_dirty('im', 'label_colors')
             self.update_model_matrix()
         
         affine = kwargs.pop('affine', None)
         if affine is not None:
             self.variables['affine'] = glm.mat4(*affine.flatten()) if isinstance(affine, np.ndarray) else affine
+        if self.lazy and self.variables.get('affine') is not None:
+            raise ValueError('Affines are not supported by lazy slices')
 
         min_val = kwargs.pop('min_val', None)
         max_val = kwargs.pop('max_val', None)
@@ -132,33 +255,216 @@ class ImageSlice(Node):
             self.variables['max_val'] = max_val
         if dimension is not None:
             self.variables['dimension'] = dimension
+            if 'im' in self.variables:
+                self.update_model_matrix()
         if slice is not None:
             self.variables['slice'] = slice
 
+        window = kwargs.pop('window', None)
+        level = kwargs.pop('level', None)
+        if window is not None or level is not None:
+            current_window, current_level = self.window_level
+            window = current_window if window is None else float(window)
+            level = current_level if level is None else float(level)
+            self.variables['min_val'] = level - window / 2
+            self.variables['max_val'] = level + window / 2
+
+        colormap = kwargs.pop('colormap', None)
+        if colormap is not None:
+            self.colormap = colormap
+
+        labels = kwargs.pop('labels', None)
+        if labels is not None:
+            self.variables['labels'] = bool(labels)
+        label_colors = kwargs.pop('label_colors', None)
+        if label_colors is not None:
+            label_colors = np.asarray(label_colors)
+            self.variables['label_colors'] = colormap_lut(label_colors, len(label_colors))
+            self.mark_dirty('label_colors')
+        label_visible = kwargs.pop('label_visible', None)
+        if label_visible is not None:
+            self.variables['label_visible'] = np.asarray(label_visible, dtype=bool).reshape(-1)
+            self.mark_dirty('label_colors')
+
+    def _set_lazy(self, lazy: bool) -> None:
+        """Switch between the 3D texture of the volume and the 2D texture of a slice"""
+        self.lazy = lazy
+        self.FRAGMENT = ImageSlice.SLICE_FRAGMENT if lazy else ImageSlice.FRAGMENT
+        self.clear_slices()
+        if self.texture is not None:
+            self.texture.release()
+            self.texture = None
+        self.mark_dirty('im')
+        if self.ctx is not None:
+            self.compile_program()
+
+    def slice_key(self) -> Tuple[int, int]:
+        """The axis of im and the index of the slice displayed in lazy mode
+
+        The x axis of the 3D texture is the last axis of im, so dimension
+        d slices the axis 2 - d, as the volume is sliced in the 3D mode.
+        """
+        shape = self.variables['im'].shape
+        axis = 2 - self.variables.get('dimension', 0)
+        index = self.variables.get('slice', int(shape[0] // 2))
+        return axis, int(np.clip(index, 0, shape[axis] - 1))
+
+    def request_slice(self, axis: int, index: int, prefetch: bool = False) -> Future:
+        """Get a slice of the lazy volume
+
+        Slices are kept in a small LRU cache. A missing slice is read in
+        the background when prefetching, and right away otherwise.
+        """
+        key = (axis, index)
+        if key in self.slices:
+            self.slices.move_to_end(key)
+            return self.slices[key]
+        im = self.variables['im']
+        if prefetch:
+            future = slice_prefetcher().submit(read_slice, im, axis, index)
+        else:
+            future = Future()
+            future.set_result(read_slice(im, axis, index))
+        self.slices[key] = future
+        while len(self.slices) > SLICE_CACHE_SIZE:
+            _, stale = self.slices.popitem(last=False)
+            stale.cancel()
+        return future
+
+    def clear_slices(self) -> None:
+        for future in self.slices.values():
+            future.cancel()
+        self.slices.clear()
+        self._slice_key = None
+
+    def prepare_slice_texture(self) -> None:
+        """Upload the displayed slice if it changed and read its neighbours ahead"""
+        key = self.slice_key()
+        if 'im' not in self._dirty and key == self._slice_key and self.texture is not None:
+            return
+        data = self.request_slice(*key).result()
+        axis, index = key
+        for step in range(1, PREFETCH_SLICES + 1):
+            for neighbour in (index + step, index - step):
+                if 0 <= neighbour < self.variables['im'].shape[axis]:
+                    self.request_slice(axis, neighbour, prefetch=True)
+        if 'im_min' not in self.variables:
+            self.variables['im_min'] = float(np.nanmin(data))
+            self.variables['im_max'] = float(np.nanmax(data))
+        # grow the default label colors when a slice holds a larger label
+        label_max = float(np.nanmax(data))
+        if label_max > self.variables.get('label_max', -np.inf):
+            self.variables['label_max'] = label_max
+            self._dirty.add('label_colors')
+        # the last axis of the slice is along x
+        size = data.shape[::-1]
+        if self.texture is not None and self.texture.size != size:
+            self.texture.release()
+            self.texture = None
+        if self.texture is None:
+            self.texture = self.ctx.texture(size, 1, dtype='f4')
+            self.texture.repeat_x = self.texture.repeat_y = False
+        self.texture.write(np.ascontiguousarray(data))
+        self.bytes_uploaded += data.nbytes
+        self._slice_key = key
+        self._dirty.discard('im')
+
+    @property
+    def window_level(self) -> Tuple[float, float]:
+        """The width and centre of the range of values the colormap spans"""
+        min_val = self.variables.get('min_val', self.variables.get('im_min', 0.0))
+        max_val = self.variables.get('max_val', self.variables.get('im_max', 1.0))
+        return max_val - min_val, (max_val + min_val) / 2
+
+    def label_texels(self) -> np.ndarray:
+        """The (N_LABELS, 4) RGBA uint8 colors of the labels, hidden ones transparent"""
+        colors = self.variables.get('label_colors')
+        if colors is None:
+            colors = label_palette(max(1, int(self.variables.get('label_max', 0)) + 1))
+        visible = self.variables.get('label_visible')
+        if visible is not None:
+            colors = colors.copy()
+            n = min(len(colors), len(visible))
+            colors[:n, 3] *= visible[:n]
+        return colors
+
+    def mark_dirty(self, *names: str) -> None:
+        if not names:
+            names = ('im', 'label_colors')
+        super().mark_dirty(*names)
+
+    def release(self) -> None:
+        for texture in (self.texture, self.label_texture):
+            if texture is not None:
+                texture.release()
+        self.texture = self.label_texture = None
+        super().release()
+
     def prepare_vao(self):
-        l, r, b, t = -1, 1, -1, 1
-        data = np.array([
-            l, b, 0, 0,
-            r, b, 1, 0,
-            r, t, 1, 1,
-            l, t, 0, 1
-        ], dtype='f4')
-        indices = np.array([0, 1, 2, 0, 2, 3], dtype='i4')
-        vbo = self.ctx.buffer(data)
-        ibo = self.ctx.buffer(indices)
-        self.vao = self.ctx.vertex_array(
-            self.program,
-            [
-                (vbo, '2f 2f', 'position', 'uv')
-            ],
-            index_buffer=ibo
-        )
+        if self.lazy:
+            self.prepare_slice_texture()
+        elif 'im' in self._dirty:
+            im = self.variables['im']
+            if self.texture is not None and self.texture.size != im.shape:
+                self.texture.release()
+                self.texture = None
+            if self.texture is None:
+                self.texture = self.ctx.texture3d(im.shape, 1, dtype='f4')
+            self.texture.write(np.ascontiguousarray(im))
+            self.bytes_uploaded += im.nbytes
+            self._dirty.discard('im')
+        labels = self.variables.get('labels', False)
+        if self.texture is not None:
+            # label maps must not be interpolated between labels
+            filter = (moderngl.NEAREST, moderngl.NEAREST) if labels else (moderngl.LINEAR, moderngl.LINEAR)
+            if self.texture.filter != filter:
+                self.texture.filter = filter
+            self.texture.use(0)
+        if labels:
+            self.prepare_label_texture()
+        else:
+            self._bind_colormap()
+        # samplers of different types must not share a unit, even unused
+        self.set_uniform('colormap', COLORMAP_UNIT)
+        self.set_uniform('label_colors', LABEL_UNIT)
+        self.set_uniform('labels', labels)
+        if self.vao is None or self._vao_stale:
+            if self.vao is not None:
+                self.vao.release()
+            vbo, ibo = quad_buffers(self.ctx)
+            self.vao = self.ctx.vertex_array(
+                self.program,
+                [
+                    (vbo, '2f 2f', 'position', 'uv')
+                ],
+                index_buffer=ibo
+            )
+            self._vao_stale = False
         im = self.variables['im']
-        self.program['min_val'] = self.variables.get('min_val', im.min())
-        self.program['max_val'] = self.variables.get('max_val', im.max())
-        self.program['dimension'] = self.variables.get('dimension', 0)
-        self.program['slice'] = self.variables.get('slice', int(im.shape[0] // 2))
-        self.program['affine'].write(self.variables.get('affine', glm.mat4(1.0)).to_bytes())
+        self.set_uniform('min_val', self.variables.get('min_val', self.variables['im_min']))
+        self.set_uniform('max_val', self.variables.get('max_val', self.variables['im_max']))
+        self.set_uniform('dimension', self.variables.get('dimension', 0))
+        self.set_uniform('slice', self.variables.get('slice', int(im.shape[0] // 2)))
+        self.set_uniform('affine', self.variables.get('affine', glm.mat4(1.0)))
+
+    def prepare_label_texture(self) -> None:
+        """Write the label colors if they changed and bind them to LABEL_UNIT"""
+        if 'label_colors' in self._dirty or self.label_texture is None:
+            texels = np.ascontiguousarray(self.label_texels())
+            if self.label_texture is not None and self.label_texture.width != len(texels):
+                self.label_texture.release()
+                self.label_texture = None
+            if self.label_texture is None:
+                self.label_texture = self.ctx.texture((len(texels), 1), 4, dtype='f1')
+                self.label_texture.filter = moderngl.NEAREST, moderngl.NEAREST
+            self.label_texture.write(texels)
+            self.bytes_uploaded += texels.nbytes
+            self._dirty.discard('label_colors')
+        self.label_texture.use(LABEL_UNIT)
+
+    @property
+    def n_vertices(self) -> int:
+        return 6
 
     def update_model_matrix(self) -> None:
         import glm
@@ -166,8 +472,12 @@ class ImageSlice(Node):
             return
         window_width, window_height = self.width, self.height
         w, h = list(set([0,1,2]) - set([self.variables['dimension']]))
-        image_width = self.variables['im'].shape[w]
-        image_height = self.variables['im'].shape[h]
+        shape = self.variables['im'].shape
+        if self.lazy:
+            # the size of the slice texture, see slice_key
+            image_width, image_height = shape[2 - w], shape[2 - h]
+        else:
+            image_width, image_height = shape[w], shape[h]
         image_aspect = image_width / image_height
         window_aspect = window_width / window_height
         translate_x = translate_y = 0.0
@@ -1,10 +1,43 @@
-from typing import Optional, Literal
+from functools import lru_cache
+from typing import Optional, Literal, Tuple
 
 import moderngl
 import numpy as np
 
+from pyqtmgl.cameras import Camera, RectCamera
 from pyqtmgl.nodes.node import Node
 
+# the index that ends a line strip, 0xFFFFFFFF once packed as 4-byte indices
+RESTART_INDEX = -1
+
+@lru_cache(maxsize=8)
+def segment_indices(n_lines: int, n_points_per_line: int) -> np.ndarray:
+    """The (segments, 2) indices joining consecutive points of each line
+
+    The array is cached per shape and read-only, so updates that keep the
+    shape reuse the same topology without rebuilding or re-uploading it.
+    """
+    lineidx = np.arange(n_points_per_line, dtype=np.int32)
+    lineidx = np.stack([lineidx[:-1], lineidx[1:]], axis=1) # (P-1, 2)
+    offset = np.arange(n_lines, dtype=np.int32) * n_points_per_line # (L,)
+    idx = np.expand_dims(offset, axis=(1,2)) + np.expand_dims(lineidx, axis=0) # (L, P-1, 2)
+    idx = idx.reshape(-1, 2)
+    idx.flags.writeable = False
+    return idx
+
+@lru_cache(maxsize=8)
+def restart_indices(n_lines: int, n_points_per_line: int) -> np.ndarray:
+    """The (lines, points + 1) indices drawing each line as a strip
+
+    Every line lists its points followed by RESTART_INDEX, so all lines are
+    one LINE_STRIP draw with half the indices of segment_indices. Cached
+    and read-only like segment_indices.
+    """
+    idx = np.arange(n_lines * n_points_per_line, dtype=np.int32).reshape(n_lines, n_points_per_line)
+    idx = np.concatenate([idx, np.full((n_lines, 1), RESTART_INDEX, dtype=np.int32)], axis=1)
+    idx.flags.writeable = False
+    return idx
+
 class Line(Node):
     REQUIRES_INDICES = True
     DRAW_MODE = moderngl.LINES
@@ -19,6 +52,10 @@ class Line(Node):
     out vec4 g_color;
 
     void main() {
+        // nothing to draw for hidden or fully transparent segments
+        if (f_color[0].a <= 0.0 && f_color[1].a <= 0.0) {
+            return;
+        }
         vec2 p0 = gl_in[0].gl_Position.xy;
         vec2 p1 = gl_in[1].gl_Position.xy;
 
@@ -31,18 +68,22 @@ class Line(Node):
 
         g_color = f_color[0];
         gl_Position = vec4(p0 + offset, 0.0, 1.0);
+        gl_PrimitiveID = gl_PrimitiveIDIn;
         EmitVertex();
 
         g_color = f_color[0];
         gl_Position = vec4(p0 - offset, 0.0, 1.0);
+        gl_PrimitiveID = gl_PrimitiveIDIn;
         EmitVertex();
 
         g_color = f_color[1];
         gl_Position = vec4(p1 + offset, 0.0, 1.0);
+        gl_PrimitiveID = gl_PrimitiveIDIn;
         EmitVertex();
 
         g_color = f_color[1];
         gl_Position = vec4(p1 - offset, 0.0, 1.0);
+        gl_PrimitiveID = gl_PrimitiveIDIn;
         EmitVertex();
 
         EndPrimitive();
@@ -81,6 +122,8 @@ class Line(Node):
         """
         super().__init__(ctx, 'line')
 
+        self._sorted_key = None
+        self._sorted_x: Optional[np.ndarray] = None
         self.n_points = 0
         self.size = size
         self.variables = {}
@@ -94,5 +137,97 @@ class Line(Node):
     def draw(self, camera):
         if self.n_points == 0:
             raise ValueError('No points to render')
-        self.program['linewidth'] = self.size
-        super().draw(camera)
\ No newline at end of file
+        self.set_uniform('linewidth', self.size)
+        super().draw(camera)
+
+    def render(self, camera: Camera) -> None:
+        segments = self.visible_segments(camera)
+        if segments is None:
+            return super().render(camera)
+        first, stop = segments[0][0], segments[1][0]
+        if stop > first:
+            self.vao.render(self.DRAW_MODE, vertices=2 * (stop - first), first=2 * first)
+
+    def line_shape(self) -> Tuple[int, int]:
+        """The number of lines and of points per line"""
+        return 1, self.n_points
+
+    def topology(self) -> np.ndarray:
+        """The indices joining the points of each line in order"""
+        return segment_indices(*self.line_shape())
+
+    def sorted_x(self) -> Optional[np.ndarray]:
+        """Get the x of the points if every line can be culled by x
+
+        That is when the indices are the node's topology, joining the
+        points of each line in order, and x never decreases along a line.
+        The check is done once per points and indices arrays.
+
+        Returns
+        -------
+        x : np.ndarray (n_lines, n_points_per_line)
+            The x of the points, with a single row if every line has the
+            same x, or None if the lines cannot be culled
+        """
+        points = self.variables.get('points')
+        indices = self.variables.get('indices')
+        if points is None or indices is None:
+            return None
+        key = self._sorted_key
+        if key is None or key[0] is not points or key[1] is not indices:
+            self._sorted_key = (points, indices)
+            self._sorted_x = None
+            n_lines, n_points_per_line = self.line_shape()
+            if n_points_per_line < 2 or n_lines * n_points_per_line != points.shape[0]:
+                return None
+            topology = self.topology()
+            if indices.size != topology.size:
+                return None
+            x = points[:, 0].reshape(n_lines, n_points_per_line)
+            if not (np.diff(x, axis=1) >= 0).all():
+                return None
+            if indices is not topology and not np.array_equal(indices.ravel(), topology.ravel()):
+                return None
+            if n_lines > 1 and (x[1:] == x[0]).all():
+                x = x[:1]
+            self._sorted_x = x
+        return self._sorted_x
+
+    def visible_segments(self, camera: Camera) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Find the segments of each line that fall within a RectCamera's x-range
+
+        Parameters
+        ----------
+        camera : Camera
+            The camera the node is drawn with
+
+        Returns
+        -------
+        first, stop : np.ndarray (n_lines,)
+            The range of visible segments of each line, or None if
+            everything should be drawn because culling is off, the camera
+            is not a RectCamera, the node has a model matrix or the lines
+            are not sorted by x
+        """
+        if not self.cull or self.model is not None or not isinstance(camera, RectCamera):
+            return None
+        x = self.sorted_x()
+        if x is None:
+            return None
+        left, right = sorted((camera.rect[0], camera.rect[2]))
+        # the geometry shader widens segments by linewidth / 2000 clip units
+        # on each side, which reaches into the view from outside its x-range
+        margin = (right - left) * self.size / 4000
+        left, right = left - margin, right + margin
+        n_segments = x.shape[1] - 1
+        # segment i joins points i and i + 1, so it is visible if
+        # x[i] <= right and x[i + 1] >= left
+        first = np.array([np.searchsorted(row, left, side='left') - 1 for row in x])
+        stop = np.array([np.searchsorted(row, right, side='right') for row in x])
+        first = np.clip(first, 0, n_segments)
+        stop = np.clip(stop, 0, n_segments)
+        n_lines = self.line_shape()[0]
+        if x.shape[0] != n_lines:
+            first = np.repeat(first, n_lines)
+            stop = np.repeat(stop, n_lines)
+        return first, stop
\ No newline at end of file
@@ -1,11 +1,48 @@
-from pyqtmgl.nodes.line import Line
+from typing import Optional, Tuple
+
+from pyqtmgl.cameras import Camera, RectCamera
+from pyqtmgl.nodes.line import Line, restart_indices, segment_indices
 from pyqtmgl.nodes.node import Node
+from pyqtmgl.nodes.programs import release_program
+import moderngl
 import numpy as np
 
+# the per-line variables, stored in the line_params texture
+LINE_VARIABLES = ('line_colors', 'line_alphas', 'gains', 'offsets', 'visible')
+
 class LineCollection(Line):
-    def __init__(self, ctx, lines=None, colors=None, alphas=None, zorder=None, offset=None, size=1):
+    VERTEX="""
+    #version 330
+    layout(std140) uniform Camera {
+        mat4 projection;
+        mat4 view;
+    };
+    uniform mat4 model;
+    uniform sampler2D line_params;
+    uniform int points_per_line;
+    in vec3 position;
+    in vec3 color;
+    in float alpha;
+    out vec4 f_color;
+    void main() {
+        // row 0 holds the colour of each line, row 1 its gain, offset and visibility
+        int line = gl_VertexID / points_per_line;
+        vec4 line_color = texelFetch(line_params, ivec2(line, 0), 0);
+        vec4 transform = texelFetch(line_params, ivec2(line, 1), 0);
+        vec3 p = vec3(position.x, position.y * transform.x + transform.y, position.z);
+        gl_Position = projection * view * model * vec4(p, 1.0);
+        f_color = vec4(color * line_color.rgb, alpha * line_color.a * transform.z);
+    }
+    """
+    DATA_ATTRIBUTES = Line.DATA_ATTRIBUTES + ('n_lines', 'n_points_per_line', 'strips')
+    SUPPORTS_SCALARS = False
+    def __init__(self, ctx, lines=None, colors=None, alphas=None, zorder=None, offset=None, size=1, strips=False):
         """LineCollection primitive
 
+        The colour, alpha, gain, offset and visibility of each line are
+        applied on the GPU from a small per-line texture, so changing them
+        costs O(N_LINES) whatever the number of points.
+
         Parameters
         ----------
         ctx : moderngl.Context
@@ -13,16 +50,35 @@ class LineCollection(Line):
         lines : np.ndarray (N_LINES, N_POINTS, 1-3)
             The lines to render
         vertex_colors : np.ndarray (N_LINES*N_POINTS, 3)
-            The colors of the points (RGB) ranging from 0 to 1
-        colors : np.ndarray (N_LINES, 3)
+            The colors of the points (RGB) ranging from 0 to 1, multiplied
+            by the colors of their line
+        colors : np.ndarray (3,) or (N_LINES, 3)
             The colors of the lines (RGB) ranging from 0 to 1
-        alphas : np.ndarray (N_LINES,)
+        alphas : float or np.ndarray (N_LINES,)
             The alpha values of the lines ranging from 0 to 1
+        offset : float or np.ndarray (N_LINES,)
+            Added to the y of each line. A scalar is the spacing between
+            consecutive lines.
+        gains : float or np.ndarray (N_LINES,)
+            The y of each line is scaled by its gain before the offset
+        visible : bool or np.ndarray (N_LINES,)
+            Whether each line is drawn
         width : float
             The width of the lines
+        strips : bool
+            Whether to draw each line as a strip rather than as separate
+            segments. This halves the indices, and the vertices processed,
+            of long lines.
         """
         Node.__init__(self, ctx, 'linecollection')
     
+        self.strips = strips
+        self.texture: Optional[moderngl.Texture] = None
+        self._drawn_key = None
+        self._drawn: Optional[np.ndarray] = None
+        self._sorted_key = None
+        self._sorted_x = None
+        self._written_commands = None
         self.n_lines = 0
         self.n_points_per_line = 0
         self.n_points = 0
@@ -82,61 +138,682 @@ class LineCollection(Line):
             self.n_points_per_line = lines.shape[1]
             self.n_points = self.n_lines * self.n_points_per_line
 
-            if offset is not None:
-                if np.isscalar(offset):
-                    offset = np.arange(self.n_lines) * offset
-                if offset.size != self.n_lines:
-                    raise ValueError('Size mismatch between offset and lines')
-                lines[:, :, 1] += offset[:, None]
-        
             points = lines.reshape(self.n_points, 3)
             self.variables['points'] = points
 
-        # for colour, alpha, and width, we repeat the values for each point
-        colors = kwargs.pop('colors', None)
         vertex_colors = kwargs.pop('vertex_colors', None)
-        if colors is not None and vertex_colors is not None:
+        if kwargs.get('colors') is not None and vertex_colors is not None:
             raise ValueError('You can only provide one of colors or vertex_colors')
-        elif colors is None and vertex_colors is None:
-            colors = np.ones((self.n_points, 3))
-        elif vertex_colors is not None:
+        line_variables = self._pop_line_variables(kwargs, offset)
+        if vertex_colors is not None:
             if vertex_colors.shape[0] != self.n_points:
                 raise ValueError('Size mismatch between vertex_colors and points')
-            colors = vertex_colors
-        elif colors is not None:
-            if colors.ndim == 1 and colors.shape[0] == 3:
-                colors = np.tile(colors, (self.n_points, 1))
-            elif colors.ndim == 2 and colors.shape[1] == 3:
-                colors = np.repeat(colors, self.n_points_per_line, axis=0)
+            kwargs['colors'] = vertex_colors
+
+        zorder = kwargs.pop('zorder', None)
+        if zorder is not None:
+            if zorder.shape[0] == self.n_lines:
+                zorder = np.repeat(zorder, self.n_points_per_line)
             else:
-                raise ValueError('Colors must be of shape (3,) or (N, 3)')
-        kwargs['colors'] = colors
+                raise ValueError('Size mismatch between zorder and lines')
+            kwargs['zorder'] = zorder
+
+        if lines is not None:
+            # the indices only depend on the shape of the lines, so they are
+            # only uploaded again when it changes
+            indices = self.topology()
+            if self.variables.get('indices') is not indices:
+                kwargs['indices'] = indices
 
+        super().update_variables(**kwargs)
+        # after the parent, which drops every variable when the number of points changes
+        self._store_line_variables(line_variables)
+
+    def _pop_line_variables(self, kwargs: dict, offset=None) -> dict:
+        """Take the per-line variables out of kwargs, checked and broadcast
+
+        They only go to the line_params texture; the ones that are not
+        given are left untouched so nothing is uploaded again.
+        """
+        line_variables = {}
+        colors = kwargs.pop('colors', None)
+        if colors is not None:
+            colors = np.array(colors, dtype='f8')
+            if colors.ndim == 1 and colors.shape[0] == 3:
+                colors = np.tile(colors, (self.n_lines, 1))
+            elif colors.shape != (self.n_lines, 3):
+                raise ValueError('Colors must be of shape (3,) or (N, 3)')
+            line_variables['line_colors'] = colors
         alphas = kwargs.pop('alphas', None)
-        if alphas is None:
-            alphas = np.ones(self.n_points)
-        elif alphas.ndim == 0:
-            alphas = np.repeat(alphas, self.n_lines)
-        elif alphas.shape[0] == self.n_lines:
-            alphas = np.repeat(alphas, self.n_points_per_line)
+        if alphas is not None:
+            line_variables['line_alphas'] = self._per_line(alphas, 'alphas')
+        gains = kwargs.pop('gains', None)
+        if gains is not None:
+            line_variables['gains'] = self._per_line(gains, 'gains')
+        if offset is not None:
+            if np.isscalar(offset):
+                offset = np.arange(self.n_lines) * offset
+            line_variables['offsets'] = self._per_line(offset, 'offset')
+        visible = kwargs.pop('visible', None)
+        if visible is not None:
+            line_variables['visible'] = self._per_line(visible, 'visible', dtype=bool)
+        return line_variables
+
+    def _store_line_variables(self, line_variables: dict) -> None:
+        """Set the per-line variables, defaulting the missing or resized ones"""
+        self.variables.update(line_variables)
+        defaults = {
+            'line_colors': lambda: np.ones((self.n_lines, 3)),
+            'line_alphas': lambda: np.ones(self.n_lines),
+            'gains': lambda: np.ones(self.n_lines),
+            'offsets': lambda: np.zeros(self.n_lines),
+            'visible': lambda: np.ones(self.n_lines, dtype=bool),
+        }
+        for name, default in defaults.items():
+            value = self.variables.get(name)
+            if value is None or len(value) != self.n_lines:
+                self.variables[name] = default()
+                line_variables[name] = self.variables[name]
+        if line_variables:
+            self.mark_dirty('line_params')
+
+    def _per_line(self, value, name: str, dtype='f8') -> np.ndarray:
+        """Broadcast a scalar or per-line value to a new (N_LINES,) array"""
+        value = np.asarray(value, dtype=dtype)
+        if value.ndim != 0 and value.shape != (self.n_lines,):
+            raise ValueError(f'Size mismatch between {name} and lines')
+        return np.array(np.broadcast_to(value, (self.n_lines,)))
+
+    def mark_dirty(self, *names: str) -> None:
+        if not names:
+            names = (*self.ATTRIBUTES, 'indices', 'line_params')
+        super().mark_dirty(*names)
+
+    def line_params(self) -> np.ndarray:
+        """The (2, N_LINES, 4) texels of the line_params texture
+
+        Row 0 is the RGBA colour of each line, row 1 its gain, offset and
+        visibility.
+        """
+        params = np.zeros((2, self.n_lines, 4), dtype='f4')
+        params[0, :, :3] = self.variables['line_colors']
+        params[0, :, 3] = self.variables['line_alphas']
+        params[1, :, 0] = self.variables['gains']
+        params[1, :, 1] = self.variables['offsets']
+        params[1, :, 2] = self.variables['visible']
+        return params
+
+    def drawn_points(self) -> Optional[np.ndarray]:
+        points = self.variables.get('points')
+        if points is None or self.n_lines == 0:
+            return points
+        key = tuple(self.variables[name] for name in ('gains', 'offsets', 'visible'))
+        if self._drawn_key is None or self._drawn_key[0] is not points or any(
+            a is not b for a, b in zip(self._drawn_key[1:], key)
+        ):
+            drawn = np.array(points, dtype='f8').reshape(self.n_lines, self.n_points_per_line, 3)
+            gains, offsets, visible = key
+            drawn[:, :, 1] = drawn[:, :, 1] * gains[:, None] + offsets[:, None]
+            drawn[~visible, :, :2] = np.nan
+            self._drawn = drawn.reshape(-1, 3)
+            self._drawn_key = (points, *key)
+        return self._drawn
+
+    def prepare_vao(self) -> None:
+        super().prepare_vao()
+        if self.n_points == 0:
+            return
+        self.write_line_params()
+
+    def write_line_params(self) -> None:
+        """Upload the line_params texture if the per-line variables changed"""
+        if 'line_params' not in self._dirty and self.texture is not None:
+            return
+        params = self.line_params()
+        if self.texture is None or self.texture.size != (self.n_lines, 2):
+            if self.texture is not None:
+                self.texture.release()
+            self.texture = self.ctx.texture((self.n_lines, 2), 4, dtype='f4')
+            self.texture.filter = moderngl.NEAREST, moderngl.NEAREST
+        self.texture.write(params)
+        self.bytes_uploaded += params.nbytes
+        self._dirty.discard('line_params')
+
+    def release(self) -> None:
+        if self.texture is not None:
+            self.texture.release()
+            self.texture = None
+        super().release()
+
+    def draw(self, camera: Camera) -> None:
+        self.set_uniform('line_params', 0)
+        self.set_uniform('points_per_line', max(1, self.n_points_per_line))
+        super().draw(camera)
+
+    @property
+    def DRAW_MODE(self) -> int:
+        return moderngl.LINE_STRIP if self.strips else moderngl.LINES
+
+    def line_shape(self) -> Tuple[int, int]:
+        return self.n_lines, self.n_points_per_line
+
+    def topology(self) -> np.ndarray:
+        if self.strips:
+            return restart_indices(self.n_lines, self.n_points_per_line)
+        return segment_indices(self.n_lines, self.n_points_per_line)
+
+    def picked_point(self, primitive: int) -> int:
+        if not self.strips:
+            return super().picked_point(primitive)
+        # primitive ids keep counting across restarts
+        line, segment = divmod(primitive, self.n_points_per_line - 1)
+        return line * self.n_points_per_line + segment
+
+    def render(self, camera: Camera) -> None:
+        self.texture.use(0)
+        segments = self.visible_segments(camera)
+        if segments is None:
+            return super().render(camera)
+        # one indexed draw per line over its visible segments
+        first, stop = segments
+        lines = np.arange(self.n_lines)
+        commands = np.zeros((self.n_lines, 5), dtype='u4')
+        commands[:, 1] = 1
+        if self.strips:
+            # the strip of segments [first, stop) runs over points [first, stop]
+            commands[:, 0] = np.where(stop > first, stop - first + 1, 0)
+            commands[:, 2] = lines * (self.n_points_per_line + 1) + first
         else:
-            raise ValueError('Size mismatch between alphas and lines')
-        kwargs['alphas'] = alphas
+            commands[:, 0] = 2 * np.maximum(stop - first, 0)
+            commands[:, 2] = 2 * (lines * (self.n_points_per_line - 1) + first)
+        commands[~self.variables['visible'], 0] = 0
+        self.render_commands(commands)
 
-        zorder = kwargs.pop('zorder', None)
-        if zorder is None:
-            zorder = np.ones(self.n_points)
-        elif zorder.shape[0] == self.n_lines:
-            zorder = np.repeat(zorder, self.n_points_per_line)
+    def render_commands(self, commands: np.ndarray) -> None:
+        """Draw the lines with (N_LINES, 5) indirect commands, uploaded only if they changed"""
+        previous = self._written_commands
+        if 'commands' not in self.buffers or previous is None or not np.array_equal(commands, previous):
+            self.write_buffer('commands', commands)
+            self._written_commands = commands
+        self.vao.render_indirect(self.buffers['commands'], self.DRAW_MODE, count=len(commands))
+
+# the vertex format and GLSL type of each sample dtype uploaded as is;
+# other dtypes are converted to float32
+SAMPLE_FORMATS = {
+    'f4': ('f4', 'float'),
+    'f2': ('f2', 'float'),
+    'i1': ('i1', 'int'),
+    'i2': ('i2', 'int'),
+    'i4': ('i4', 'int'),
+    'u1': ('u1', 'uint'),
+    'u2': ('u2', 'uint'),
+    'u4': ('u4', 'uint'),
+}
+
+class SampledLineCollection(LineCollection):
+    VERTEX = """
+    #version 330
+    layout(std140) uniform Camera {
+        mat4 projection;
+        mat4 view;
+    };
+    uniform mat4 model;
+    uniform sampler2D line_params;
+    uniform int points_per_line;
+    uniform float start;
+    uniform float period;
+    uniform int repeat;
+    in float value;
+    out vec4 f_color;
+    out int f_vertex;
+    void main() {
+        int line = gl_VertexID / points_per_line;
+        int index = gl_VertexID - line * points_per_line;
+        vec4 line_color = texelFetch(line_params, ivec2(line, 0), 0);
+        vec4 transform = texelFetch(line_params, ivec2(line, 1), 0);
+        float x = start + float(index / repeat) * period;
+        float y = float(value) * transform.x + transform.y;
+        gl_Position = projection * view * model * vec4(x, y, 0.0, 1.0);
+        f_color = vec4(line_color.rgb, line_color.a * transform.z);
+        f_vertex = gl_VertexID;
+    }
+    """
+    # primitive ids restart with every indirect draw, so the segments report
+    # the vertex they start from instead
+    GEOMETRY = Line.GEOMETRY.replace(
+        'in vec4 f_color[];  // Color from vertex shader',
+        'in vec4 f_color[];  // Color from vertex shader\n    in int f_vertex[];'
+    ).replace('gl_PrimitiveID = gl_PrimitiveIDIn;', 'gl_PrimitiveID = f_vertex[0];')
+    REQUIRES_INDICES = False
+    DRAW_MODE = moderngl.LINE_STRIP
+    DATA_ATTRIBUTES = ('variables', 'n_points', 'n_lines', 'n_points_per_line', 'start', 'period', 'repeat')
+    def __init__(self, ctx, values=None, start=0.0, period=1.0, repeat=1, colors=None, alphas=None, offset=None, size=1):
+        """LineCollection of uniformly sampled traces, uploading only their values
+
+        The x of each vertex is computed in the vertex shader from its
+        index, and the per-line colour, gain, offset and visibility come
+        from the line_params texture, so a sample costs one value in its
+        source dtype (e.g. 2 bytes for int16) instead of seven floats.
+
+        Parameters
+        ----------
+        ctx : moderngl.Context
+            The context to use
+        values : np.ndarray (N_LINES, N_POINTS)
+            The samples. float32, float16 and integer types of up to 4
+            bytes are uploaded as is, anything else as float32.
+        start : float
+            The x of the first sample. It is a float32 on the GPU, so keep it
+            near the view for long recordings.
+        period : float
+            The x distance between consecutive samples
+        repeat : int
+            The number of consecutive values sharing an x, e.g. 2 for
+            min/max pairs
+        colors, alphas, offset, gains, visible
+            The per-line variables, as for LineCollection
+        size : float
+            The width of the lines
+        """
+        Node.__init__(self, ctx, 'sampledlinecollection')
+
+        self.texture: Optional[moderngl.Texture] = None
+        self._drawn_key = None
+        self._drawn: Optional[np.ndarray] = None
+        self._written_commands = None
+        self.n_lines = 0
+        self.n_points_per_line = 0
+        self.n_points = 0
+        self.size = size
+        self.start = float(start)
+        self.period = float(period)
+        self.repeat = int(repeat)
+
+        self.variables = {}
+        if values is not None:
+            self.update_variables(values=values, colors=colors, alphas=alphas, offset=offset)
+
+    def update_variables(self, **kwargs):
+        self.touch()
+        values = kwargs.pop('values', None)
+        if values is None:
+            if 'values' not in self.variables:
+                raise ValueError('You must provide values')
+        else:
+            values = np.asarray(values)
+            if values.ndim == 1:
+                values = values[None]
+            if values.ndim != 2:
+                raise ValueError('Values must be of shape (N_LINES, N_POINTS) or (N_POINTS,)')
+            if f'{values.dtype.kind}{values.dtype.itemsize}' not in SAMPLE_FORMATS:
+                values = values.astype('f4')
+            self.n_lines, self.n_points_per_line = values.shape
+            self.n_points = values.size
+            self.variables['values'] = values
+            self._set_sample_type(values.dtype)
+            self.mark_dirty('values')
+
+        start = kwargs.pop('start', None)
+        if start is not None:
+            self.start = float(start)
+        period = kwargs.pop('period', None)
+        if period is not None:
+            self.period = float(period)
+        repeat = kwargs.pop('repeat', None)
+        if repeat is not None:
+            self.repeat = int(repeat)
+        if self.period <= 0 or self.repeat < 1:
+            raise ValueError('Period must be positive and repeat at least 1')
+
+        line_variables = self._pop_line_variables(kwargs, kwargs.pop('offset', None))
+        if kwargs:
+            raise ValueError(f'Unsupported variables: {", ".join(kwargs)}')
+        self._store_line_variables(line_variables)
+
+    @staticmethod
+    def sample_format(dtype: np.dtype) -> Tuple[str, str]:
+        """The vertex format and GLSL type of samples of a supported dtype"""
+        return SAMPLE_FORMATS[f'{dtype.kind}{dtype.itemsize}']
+
+    def _set_sample_type(self, dtype: np.dtype) -> None:
+        """Switch to the program whose value input matches the sample dtype"""
+        _, glsl_type = self.sample_format(dtype)
+        vertex = SampledLineCollection.VERTEX.replace('in float value;', f'in {glsl_type} value;')
+        if vertex == self.VERTEX:
+            return
+        self.VERTEX = vertex
+        if self.ctx is None:
+            return
+        if self._pick_vao is not None:
+            self._pick_vao.release()
+            self._pick_vao = self._pick_vao_of = None
+        if self._pick_entry is not None:
+            release_program(self.ctx, self._pick_entry)
+            self._pick_entry = None
+        self.compile_program()
+
+    def mark_dirty(self, *names: str) -> None:
+        if not names:
+            names = ('values', 'line_params')
+        Node.mark_dirty(self, *names)
+
+    def pack(self, names=None):
+        return {'values': np.ascontiguousarray(self.variables['values'])}
+
+    def adopt(self, other: Node, packed=None) -> None:
+        super().adopt(other, packed)
+        self._set_sample_type(self.variables['values'].dtype)
+
+    def vertex_array_content(self) -> list:
+        fmt, _ = self.sample_format(self.variables['values'].dtype)
+        return [(self.buffers['values'], fmt, 'value')]
+
+    def drawn_points(self) -> Optional[np.ndarray]:
+        values = self.variables.get('values')
+        if values is None or self.n_points == 0:
+            return None
+        key = (values, *(self.variables[name] for name in ('gains', 'offsets', 'visible')))
+        layout = (self.start, self.period, self.repeat)
+        if self._drawn_key is None or self._drawn_key[1] != layout or any(
+            a is not b for a, b in zip(self._drawn_key[0], key)
+        ):
+            _, gains, offsets, visible = key
+            drawn = np.zeros((self.n_lines, self.n_points_per_line, 3))
+            drawn[:, :, 0] = self.start + (np.arange(self.n_points_per_line) // self.repeat) * self.period
+            drawn[:, :, 1] = values * gains[:, None] + offsets[:, None]
+            drawn[~visible, :, :2] = np.nan
+            self._drawn = drawn.reshape(-1, 3)
+            self._drawn_key = (key, layout)
+        return self._drawn
+
+    def picked_point(self, primitive: int) -> int:
+        return primitive
+
+    def prepare_vao(self) -> None:
+        if self.ctx is None:
+            raise ValueError('No context set')
+        if self.n_points == 0:
+            return
+        if 'values' in self._dirty:
+            values = self._packed.pop('values', None)
+            self.write_buffer('values', values if values is not None else self.pack()['values'])
+        self.write_line_params()
+        if self._vao_stale or self.vao is None:
+            if self.vao is not None:
+                self.vao.release()
+            self.vao = self.ctx.vertex_array(self.program, self.vertex_array_content())
+            self._vao_stale = False
+
+    def visible_samples(self, camera: Camera) -> Tuple[int, int]:
+        """The range of samples to draw, those within a RectCamera's x-range
+
+        Every sample is drawn if culling is off, the node has a model
+        matrix or the camera is not a RectCamera.
+        """
+        n = self.n_points_per_line
+        if not self.cull or self.model is not None or not isinstance(camera, RectCamera):
+            return 0, n
+        left, right = sorted((camera.rect[0], camera.rect[2]))
+        # as for visible_segments, thick segments reach in from outside
+        margin = (right - left) * self.size / 4000
+        first = np.floor((left - margin - self.start) / self.period)
+        last = np.ceil((right + margin - self.start) / self.period)
+        first = int(np.clip(first * self.repeat, 0, n))
+        stop = int(np.clip((last + 1) * self.repeat, 0, n))
+        return first, stop
+
+    def draw(self, camera: Camera) -> None:
+        self.set_uniform('start', self.start)
+        self.set_uniform('period', self.period)
+        self.set_uniform('repeat', self.repeat)
+        super().draw(camera)
+
+    def render(self, camera: Camera) -> None:
+        self.texture.use(0)
+        first, stop = self.visible_samples(camera)
+        commands = np.zeros((self.n_lines, 5), dtype='u4')
+        commands[:, 0] = stop - first if stop - first >= 2 else 0
+        commands[:, 1] = 1
+        commands[:, 2] = np.arange(self.n_lines) * self.n_points_per_line + first
+        commands[~self.variables['visible'], 0] = 0
+        self.render_commands(commands)
+
+class StreamingLineCollection(LineCollection):
+    VERTEX = """
+    #version 330
+    layout(std140) uniform Camera {
+        mat4 projection;
+        mat4 view;
+    };
+    uniform mat4 model;
+    uniform sampler2D line_colors;
+    uniform int capacity;
+    uniform int head;
+    uniform float offset;
+    in float value;
+    out vec4 f_color;
+    void main() {
+        // each line owns capacity + 1 consecutive slots, the last one
+        // mirroring slot 0 so a strip can run across the wrap point
+        int line = gl_VertexID / (capacity + 1);
+        int slot = gl_VertexID - line * (capacity + 1);
+        // the oldest sample is drawn at x = 0 and the newest at capacity - 1
+        float x = float((slot - head + capacity) % capacity);
+        gl_Position = projection * view * model * vec4(x, value + line * offset, 0.0, 1.0);
+        f_color = texelFetch(line_colors, ivec2(line, 0), 0);
+    }
+    """
+    # primitive ids restart with every indirect draw, so they cannot be told apart
+    PICK_FRAGMENT = None
+    REQUIRES_INDICES = False
+    DRAW_MODE = moderngl.LINE_STRIP
+    def __init__(self, ctx, n_lines, capacity, colors=None, alphas=None, offset=0, size=1):
+        """LineCollection fed by appending samples into a fixed-size ring buffer
+
+        Each append only uploads the new samples, and the view scrolls by
+        moving the ring's head rather than rewriting the vertices, so keeping
+        the last `capacity` samples on screen costs O(new samples) per frame.
+
+        Parameters
+        ----------
+        ctx : moderngl.Context
+            The context to use
+        n_lines : int
+            The number of lines (channels)
+        capacity : int
+            The number of samples kept per line
+        colors : np.ndarray (3,) or (N_LINES, 3)
+            The colors of the lines (RGB) ranging from 0 to 1
+        alphas : float or np.ndarray (N_LINES,)
+            The alpha values of the lines ranging from 0 to 1
+        offset : float
+            The vertical spacing between consecutive lines
+        size : float
+            The width of the lines
+        """
+        Node.__init__(self, ctx, 'streaminglinecollection')
+
+        if capacity < 2:
+            raise ValueError('Capacity must be at least 2')
+        self.n_lines = n_lines
+        self.capacity = capacity
+        self.n_points_per_line = 0
+        self.n_points = 0
+        self.size = size
+        self.texture = None
+        self.n_appended = 0
+        self._pending = []
+
+        self.variables = {
+            'values': np.zeros((n_lines, capacity + 1), dtype='f4'),
+            'colors': np.ones((n_lines, 3)),
+            'alphas': np.ones(n_lines),
+            'offset': offset,
+        }
+        self.update_variables(colors=colors, alphas=alphas)
+        self.mark_dirty()
+
+    @property
+    def head(self) -> int:
+        """The slot the next sample is written to"""
+        return self.n_appended % self.capacity
+
+    def mark_dirty(self, *names: str) -> None:
+        if not names:
+            names = ('values', 'commands', 'line_colors')
+        super().mark_dirty(*names)
+
+    def update_variables(self, **kwargs):
+        self.touch()
+        colors = kwargs.pop('colors', None)
+        if colors is not None:
+            colors = np.asarray(colors)
+            if colors.ndim == 1:
+                colors = np.tile(colors, (self.n_lines, 1))
+            if colors.shape != (self.n_lines, 3):
+                raise ValueError('Colors must be of shape (3,) or (N_LINES, 3)')
+            self.variables['colors'] = colors
+            self.mark_dirty('line_colors')
+
+        alphas = kwargs.pop('alphas', None)
+        if alphas is not None:
+            alphas = np.broadcast_to(np.asarray(alphas, dtype='f8'), (self.n_lines,))
+            self.variables['alphas'] = alphas
+            self.mark_dirty('line_colors')
+
+        offset = kwargs.pop('offset', None)
+        if offset is not None:
+            self.variables['offset'] = offset
+
+        if kwargs:
+            raise ValueError(f'Unsupported variables: {", ".join(kwargs)}')
+
+    def append(self, samples) -> None:
+        """Append new samples to the end of every line
+
+        Only the CPU copy of the ring is touched here; the new slots are
+        uploaded on the next draw, so this can be called without a current
+        context.
+
+        Parameters
+        ----------
+        samples : np.ndarray (N_LINES, K) or (N_LINES,)
+            The new samples. If K exceeds the capacity, only the last
+            `capacity` samples are kept.
+        """
+        samples = np.asarray(samples, dtype='f4')
+        if samples.ndim == 1:
+            samples = samples[:, None]
+        if samples.shape[0] != self.n_lines:
+            raise ValueError('Samples must be of shape (N_LINES, K)')
+        n_new = samples.shape[1]
+        if n_new > self.capacity:
+            self.n_appended += n_new - self.capacity
+            samples = samples[:, -self.capacity:]
+            n_new = self.capacity
+
+        values = self.variables['values']
+        start = self.head
+        stop = min(start + n_new, self.capacity)
+        values[:, start:stop] = samples[:, :stop - start]
+        self._pending.append((start, stop))
+        if stop - start < n_new:
+            values[:, :n_new - (stop - start)] = samples[:, stop - start:]
+            self._pending.append((0, n_new - (stop - start)))
+        if start == 0 or stop - start < n_new:
+            values[:, self.capacity] = values[:, 0]
+            self._pending.append((self.capacity, self.capacity + 1))
+
+        self.n_appended += n_new
+        self.n_points_per_line = min(self.n_appended, self.capacity)
+        self.n_points = self.n_lines * self.n_points_per_line
+        if sum(stop - start for start, stop in self._pending) > self.capacity:
+            self.mark_dirty('values')
+        self.mark_dirty('commands')
+
+    def reset(self) -> None:
+        """Drop every sample"""
+        self.n_appended = 0
+        self.n_points_per_line = self.n_points = 0
+        self.variables['values'][:] = 0
+        self._pending = []
+        self.mark_dirty('values', 'commands')
+
+    def _commands(self) -> np.ndarray:
+        """The indirect draw commands of each strip
+
+        moderngl reads indirect commands with a 20 byte stride, so each
+        (count, instances, first, base instance) command is padded to five
+        words.
+        """
+        stride = self.capacity + 1
+        first = np.arange(self.n_lines) * stride
+        if self.n_appended < self.capacity:
+            commands = [(self.n_appended, 1, first, 0, 0)]
+        elif self.head == 0:
+            commands = [(self.capacity, 1, first, 0, 0)]
         else:
-            raise ValueError('Size mismatch between zorder and lines')
-        kwargs['zorder'] = zorder
+            # oldest samples through the mirrored slot, then the newest ones
+            commands = [
+                (self.capacity - self.head + 1, 1, first + self.head, 0, 0),
+                (self.head, 1, first, 0, 0),
+            ]
+        return np.concatenate(
+            [np.stack(np.broadcast_arrays(*command), axis=1) for command in commands]
+        ).astype('u4')
 
-        # we need to construct the indices for the lines
-        lineidx = np.arange(self.n_points_per_line, dtype=np.int32)
-        lineidx = np.stack([lineidx[:-1], lineidx[1:]], axis=1) # (P-1, 2)
-        offset = np.arange(self.n_lines, dtype=np.int32) * self.n_points_per_line # (L,)
-        idx = np.expand_dims(offset, axis=(1,2)) + np.expand_dims(lineidx, axis=0) # (L, P-1, 2)
-        kwargs['indices'] = idx.reshape(-1, 2)
+    def prepare_vao(self) -> None:
+        if self.ctx is None:
+            raise ValueError('No context set')
+        values = self.variables['values']
+        if 'values' in self._dirty:
+            self.write_buffer('values', values)
+        else:
+            buffer = self.buffers['values']
+            stride = (self.capacity + 1) * values.itemsize
+            for start, stop in self._pending:
+                for line in range(self.n_lines):
+                    buffer.write(values[line, start:stop], offset=line * stride + start * values.itemsize)
+                self.bytes_uploaded += (stop - start) * values.itemsize * self.n_lines
+        self._pending = []
+        if 'commands' in self._dirty:
+            self.write_buffer('commands', self._commands())
+        if 'line_colors' in self._dirty:
+            colors = np.concatenate(
+                [self.variables['colors'], self.variables['alphas'][:, None]],
+                axis=1
+            ).astype('f4')
+            if self.texture is None or self.texture.width != self.n_lines:
+                if self.texture is not None:
+                    self.texture.release()
+                self.texture = self.ctx.texture((self.n_lines, 1), 4, dtype='f4')
+                self.texture.filter = moderngl.NEAREST, moderngl.NEAREST
+            self.texture.write(colors)
+            self.bytes_uploaded += colors.nbytes
+            self._dirty.discard('line_colors')
+        if self._vao_stale or self.vao is None:
+            if self.vao is not None:
+                self.vao.release()
+            self.vao = self.ctx.vertex_array(
+                self.program,
+                [
+                    (self.buffers['values'], '1f', 'value')
+                ]
+            )
+            self._vao_stale = False
 
-        return super().update_variables(**kwargs)
\ No newline at end of file
+    def draw(self, camera):
+        if self.ctx is None:
+            raise ValueError('No context set')
+        self.prepare_vao()
+        if self.n_appended < 2:
+            return
+        self._prepare_camera_uniforms(camera)
+        self.texture.use(0)
+        self.set_uniform('line_colors', 0)
+        self.set_uniform('capacity', self.capacity)
+        self.set_uniform('head', self.head)
+        self.set_uniform('offset', float(self.variables['offset']))
+        self.set_uniform('linewidth', self.size)
+        self.ctx.enable(self.CTX_FLAGS)
+        self.vao.render_indirect(self.buffers['commands'], self.DRAW_MODE, count=self.buffers['commands'].size // 20)
@@ -1,23 +1,57 @@
-from typing import List, Optional, SupportsFloat
+from typing import Dict, List, Optional, Sequence, Set, SupportsFloat, Tuple
+import weakref
 
 import moderngl
 import numpy as np
 
 from pyqtmgl.cameras import Camera
+from pyqtmgl.colormaps import COLORMAP_UNIT, Colormap, colormap_texture
+from pyqtmgl.data.grid import GridIndex
+from pyqtmgl.nodes.programs import ProgramEntry, acquire_program, camera_block, release_program
+
+# the number of vertices consumed by each primitive of a draw mode
+PRIMITIVE_VERTICES = {
+    moderngl.POINTS: 1,
+    moderngl.LINES: 2,
+    moderngl.TRIANGLES: 3,
+}
+IDENTITY = np.eye(4, dtype='f4')
+
+_CONSTANT_BUFFERS = weakref.WeakKeyDictionary()
+
+def constant_buffer(ctx: moderngl.Context) -> moderngl.Buffer:
+    """Get the 4 bytes of 255 read as the default white color and opaque alpha"""
+    if ctx not in _CONSTANT_BUFFERS:
+        _CONSTANT_BUFFERS[ctx] = ctx.buffer(np.full(4, 255, dtype=np.uint8))
+    return _CONSTANT_BUFFERS[ctx]
 
 class Node:
     VERTEX="""
     #version 330
-    uniform mat4 projection;
-    uniform mat4 view;
+    layout(std140) uniform Camera {
+        mat4 projection;
+        mat4 view;
+    };
     uniform mat4 model;
+    uniform bool use_colormap;
+    uniform sampler2D colormap;
+    uniform vec2 clim;
     in vec3 position;
     in vec3 color;
     in float alpha;
+    in float scalar;
     out vec4 f_color;
     void main() {
         gl_Position = projection * view * model * vec4(position, 1.0);
-        f_color = vec4(color, alpha);
+        if (use_colormap) {
+            // map [clim.x, clim.y] onto the centres of the first and last texels
+            float n = float(textureSize(colormap, 0).x);
+            float t = clamp((scalar - clim.x) / (clim.y - clim.x), 0.0, 1.0);
+            vec4 mapped = textureLod(colormap, vec2((t * (n - 1.0) + 0.5) / n, 0.5), 0.0);
+            f_color = vec4(mapped.rgb, mapped.a * alpha);
+        } else {
+            f_color = vec4(color, alpha);
+        }
     }
     """
     FRAGMENT="""
@@ -29,20 +63,63 @@ class Node:
     }
     """
     GEOMETRY = None
+    # fragment shader of the picking pass, None if the node cannot be picked
+    PICK_FRAGMENT="""
+    #version 330
+    uniform uint node_id;
+    out uvec2 pick;
+    void main() {
+        pick = uvec2(node_id, uint(gl_PrimitiveID) + 1u);
+    }
+    """
     REQUIRES_INDICES = False
     CTX_FLAGS = moderngl.DEPTH_TEST | moderngl.BLEND
     DRAW_MODE = moderngl.POINTS
+    # variable -> (format, shader input) of each per-vertex attribute,
+    # every one of them uploaded to its own buffer
+    ATTRIBUTES = {
+        'points': ('3f', 'position'),
+        'colors': ('3f', 'color'),
+        'alphas': ('1f', 'alpha'),
+        'scalars': ('1f', 'scalar'),
+    }
+    # whether VERTEX maps scalars through a colormap
+    SUPPORTS_SCALARS = True
+    POSITION_VARIABLES = ('points', 'x', 'y', 'z', 'zorder')
+    DATA_ATTRIBUTES = ('variables', 'n_points', '_is_3d')
 
     def __init__(self, ctx: Optional[moderngl.Context], name):
-        if ctx is None:
-            self.ctx = None
-        else:
+        # bumped on every change, so widgets can tell when to draw again
+        self.version = 0
+        self.ctx = None
+        self.vao: Optional[moderngl.VertexArray] = None
+        self.buffers: Dict[str, moderngl.Buffer] = {}
+        self._dirty: Set[str] = set()
+        self._vao_stale = True
+        self._vao_layout = None
+        self._uniforms = {}
+        self._packed: Dict[str, np.ndarray] = {}
+        self._program_entry: Optional[ProgramEntry] = None
+        self.program: Optional[moderngl.Program] = None
+        self._index: Optional[GridIndex] = None
+        self._pick_entry: Optional[ProgramEntry] = None
+        self._pick_vao: Optional[moderngl.VertexArray] = None
+        self._pick_vao_of: Optional[moderngl.VertexArray] = None
+        # running total of the bytes written to the GPU, read by the profiler
+        self.bytes_uploaded = 0
+        # whether nodes that support it only draw what the camera shows
+        self.cull = True
+        if ctx is not None:
             self.set_context(ctx)
         self.name = name
         self.children: List[Node] = []
         self._is_3d = True
         self.model = None
         self.n_points = 0
+        # the colormap and (vmin, vmax) limits of scalars, see update_variables
+        self.colormap: Colormap = 'viridis'
+        self.clim: Optional[Tuple[float, float]] = None
+        self._colormap_texture = None
 
     def __repr__(self):
         return self.name
@@ -51,21 +128,108 @@ class Node:
         return self.name
 
     def set_context(self, ctx: moderngl.Context):
+        if self.ctx is not None and self.ctx is not ctx:
+            self.release()
         self.ctx = ctx
         self.compile_program()
+        self.mark_dirty()
         if not hasattr(self, 'children'):
             return
         for child in self.children:
             child.set_context(ctx)
 
     def compile_program(self):
+        """Get the program of this node from the per-context program cache"""
         if self.ctx is None:
             raise ValueError('No context set')
-        self.program = self.ctx.program(
+        previous = self._program_entry
+        self._program_entry = acquire_program(
+            self.ctx,
             vertex_shader=self.VERTEX,
             fragment_shader=self.FRAGMENT,
             geometry_shader=self.GEOMETRY
         )
+        if previous is not None:
+            release_program(self.ctx, previous)
+        self.program = self._program_entry.program
+        # the program is shared, so the last written values are tracked per program
+        self._uniforms = self._program_entry.uniforms
+        self._vao_stale = True
+
+    def release(self) -> None:
+        """Release the GPU resources owned by this node and its children
+
+        The node is detached from its context but keeps its CPU-side
+        variables, so after set_context is called again every buffer is
+        re-created and re-filled on the next draw. The context must be
+        current when this is called.
+        """
+        if self.vao is not None:
+            self.vao.release()
+            self.vao = None
+        for buffer in self.buffers.values():
+            buffer.release()
+        self.buffers = {}
+        if self._program_entry is not None:
+            release_program(self.ctx, self._program_entry)
+            self._program_entry = None
+            self.program = None
+        if self._pick_vao is not None:
+            self._pick_vao.release()
+            self._pick_vao = self._pick_vao_of = None
+        if self._pick_entry is not None:
+            release_program(self.ctx, self._pick_entry)
+            self._pick_entry = None
+        self.ctx = None
+        self.mark_dirty()
+        for child in getattr(self, 'children', []):
+            child.release()
+
+    def mark_dirty(self, *names: str) -> None:
+        """Flag GPU buffers as out of date with the CPU-side variables
+
+        Parameters
+        ----------
+        names : str
+            The buffers to flag. If none are given, every buffer is flagged.
+        """
+        if not names:
+            names = (*self.ATTRIBUTES, 'indices')
+        self._dirty.update(names)
+        self.touch()
+
+    def touch(self) -> None:
+        """Flag the node as changed so that widgets draw it again
+
+        Call this after changing attributes that affect the drawing, such
+        as size or model, directly.
+        """
+        self.version += 1
+
+    def set_uniform(self, name: str, value) -> None:
+        """Write a uniform of the program, skipping the write if it is unchanged
+
+        Parameters
+        ----------
+        name : str
+            The name of the uniform
+        value : scalar, tuple, np.ndarray or glm type
+            The value to write. Arrays and glm types are written as bytes.
+        """
+        if hasattr(value, 'to_bytes') and not isinstance(value, int):
+            value = value.to_bytes()
+        elif isinstance(value, np.ndarray):
+            value = value.astype('f4').tobytes()
+        if self._uniforms.get(name) == value:
+            return
+        if self.program.get(name, None) is None:
+            # unused uniforms are optimized out of the program
+            return
+        if isinstance(value, bytes):
+            self.program[name].write(value) # type: ignore
+        else:
+            self.program[name].value = value # type: ignore
+        self._uniforms[name] = value
 
     def add(self, node: 'Node'):
         self.children.append(node)
@@ -75,6 +239,12 @@ class Node:
         self.height = height
 
     def update_variables(self, **kwargs):
+        self.touch()
+        if any(kwargs.get(key) is not None for key in self.POSITION_VARIABLES):
+            self.mark_dirty('points')
+        for name in (*self.ATTRIBUTES, 'indices'):
+            if name != 'points' and kwargs.get(name) is not None:
+                self.mark_dirty(name)
         points = kwargs.pop('points', None)
         if points is None and any(dim in kwargs for dim in ['x', 'y', 'z']):
             x = kwargs.pop('x', None)
@@ -140,6 +310,7 @@ class Node:
             if 'points' not in self.variables or points.shape[0] != self.variables['points'].shape[0]:
                 # clear variables if points have changed
                 self.variables = {}
+                self.mark_dirty()
             self.variables['points'] = points
 
         if 'points' in self.variables:
@@ -158,33 +329,61 @@ class Node:
             z = (zorder / zorder.max()) # normalize to [-1, 1]
             self.variables['points'][:, 2] = z
 
+        # colors and alphas that are missing, or the same for every point,
+        # are not repeated per point: they are bound as a single value
         colors = kwargs.pop('colors', None)
         if colors is not None:
             colors = np.asarray(colors)
-            if colors.ndim == 1:
-                colors = np.repeat(colors[None, :], n_points, axis=0)
-            if colors.shape[1] != 3:
-                raise ValueError('Colors must be of shape (N, 3)')
+            if colors.dtype == np.uint8:
+                if colors.shape[-1] not in (3, 4) or colors.ndim > 2:
+                    raise ValueError('uint8 colors must be of shape (3,), (4,), (N, 3) or (N, 4)')
+                if colors.shape[-1] == 4 and kwargs.get('alphas') is None:
+                    # RGBA colors carry their own alphas
+                    self.variables['alphas'] = None
+            elif colors.shape[-1] != 3 or colors.ndim > 2:
+                raise ValueError('Colors must be of shape (3,) or (N, 3)')
+            if colors.ndim == 2 and colors.shape[0] != n_points:
+                raise ValueError('Colors must be of shape (3,) or (N, 3)')
             self.variables['colors'] = colors
-        if self.variables.get('colors') is None:
-            self.variables['colors'] = np.ones((n_points, 3))
-        
+            # colors replace scalars
+            self.variables['scalars'] = None
+
         alphas = kwargs.pop('alphas', None)
         if alphas is not None:
-            if np.isscalar(alphas):
+            if np.ndim(alphas) == 0:
                 if not isinstance(alphas, SupportsFloat):
                     raise ValueError('Alphas must be a scalar or an array')
-                alphas = np.ones(n_points) * float(alphas)
+                alphas = np.asarray(float(alphas))
             else:
                 alphas = np.asarray(alphas)
-            if alphas.shape[0] != n_points:
-                raise ValueError('Alphas must be of shape (N,)')
-            self.variables['alphas'] = alphas[:, None]
-        if self.variables.get('alphas') is None:
-            self.variables['alphas'] = np.ones((n_points, 1))
+                if alphas.shape[0] != n_points:
+                    raise ValueError('Alphas must be of shape (N,)')
+                alphas = alphas.reshape(n_points, 1)
+            self.variables['alphas'] = alphas
+            if self._rgba8_colors():
+                # the alphas are uploaded in the alpha byte of the colors
+                self.mark_dirty('colors')
+
+        scalars = kwargs.pop('scalars', None)
+        if scalars is not None:
+            if not self.SUPPORTS_SCALARS:
+                raise ValueError(f'{type(self).__name__} does not support scalars')
+            scalars = np.asarray(scalars)
+            if scalars.shape != (n_points,):
+                raise ValueError('Scalars must be of shape (N,)')
+            self.variables['scalars'] = scalars
+            if self.clim is None and kwargs.get('clim') is None and n_points:
+                self.clim = (float(np.nanmin(scalars)), float(np.nanmax(scalars)))
+        colormap = kwargs.pop('colormap', None)
+        if colormap is not None:
+            self.colormap = colormap
+        clim = kwargs.pop('clim', None)
+        if clim is not None:
+            vmin, vmax = map(float, clim)
+            self.clim = (vmin, vmax)
 
         indices = kwargs.pop('indices', None)
-        if indices == 'auto':
+        if isinstance(indices, str) and indices == 'auto':
             indices = np.arange(n_points, dtype='i4')
             indices = np.stack([indices[:-1], indices[1:]], axis=1).flatten()
         if indices is not None:
@@ -195,18 +394,41 @@ class Node:
             indices = np.arange(n_points, dtype='i4')
             indices = np.stack([indices[:-1], indices[1:]], axis=1).flatten()
             self.variables['indices'] = indices
+            self.mark_dirty('indices')
 
         for variable, value in kwargs.items():
             self.variables[variable] = value
 
+    def drawn_points(self) -> Optional[np.ndarray]:
+        """The points where they are drawn, before the camera and model
+
+        Nodes that move their points on the GPU override this; points that
+        are not drawn are NaN.
+        """
+        return self.variables.get('points') if hasattr(self, 'variables') else None
+
+    def spatial_index(self) -> Optional[GridIndex]:
+        """Get the grid index of the x and y coordinates of the points
+
+        It is built on first use and rebuilt when the points are replaced.
+        Returns None if the node has no points.
+        """
+        points = self.drawn_points()
+        if points is None or len(points) == 0:
+            return None
+        if self._index is None or self._index.points is not points:
+            self._index = GridIndex(points)
+        return self._index
+
     def _prepare_camera_uniforms(self, camera: Camera) -> None:
-        projection, view = camera.get_matrices()
-        self.program['projection'].write(projection.to_bytes()) # type: ignore
-        self.program['view'].write(view.to_bytes()) # type: ignore
-        if self.model is not None:
-            self.program['model'].write(self.model.to_bytes()) # type: ignore
+        if self.program.get('Camera', None) is not None:
+            camera_block(self.ctx).publish(camera)
         else:
-            self.program['model'] = np.eye(4, dtype='f4').flatten()
+            # programs of custom nodes that still declare the matrices as uniforms
+            projection, view = camera.get_matrices()
+            self.set_uniform('projection', projection)
+            self.set_uniform('view', view)
+        self.set_uniform('model', self.model if self.model is not None else IDENTITY)
 
     def draw(self, camera: Camera) -> None:
         if self.ctx is None:
@@ -214,32 +436,294 @@ class Node:
         self.prepare_vao()
         if not self.vao is None:
             self._prepare_camera_uniforms(camera)
+            self._prepare_color_uniforms()
             self.ctx.enable(self.CTX_FLAGS)
-            self.vao.render(self.DRAW_MODE)
+            self.render(camera)
         for child in self.children:
             child.draw(camera)
 
+    def render(self, camera: Camera) -> None:
+        """Issue the draw calls of the prepared vertex array"""
+        self.vao.render(self.DRAW_MODE, vertices=self.n_vertices)
+
+    def draw_pick(self, camera: Camera, node_id: int) -> None:
+        """Draw the node into the bound integer framebuffer for picking
+
+        Every fragment is written as (node_id, primitive + 1) by the same
+        draw calls as draw, only with PICK_FRAGMENT as fragment shader.
+        Children are drawn with the same node_id.
+
+        Parameters
+        ----------
+        camera : Camera
+            The camera to draw with
+        node_id : int
+            The non-zero id written for this node
+        """
+        if self.ctx is None:
+            raise ValueError('No context set')
+        if self.PICK_FRAGMENT is None or self.n_points == 0:
+            return
+        self.prepare_vao()
+        if self.vao is None:
+            return
+        if self._pick_entry is None:
+            self._pick_entry = acquire_program(
+                self.ctx,
+                vertex_shader=self.VERTEX,
+                fragment_shader=self.PICK_FRAGMENT,
+                geometry_shader=self.GEOMETRY
+            )
+        if self._pick_vao_of is not self.vao:
+            # the vertex array has been rebuilt since the last picking pass
+            if self._pick_vao is not None:
+                self._pick_vao.release()
+            self._pick_vao = self.ctx.vertex_array(
+                self._pick_entry.program,
+                self.vertex_array_content(),
+                index_buffer=self.buffers.get('indices') if self.REQUIRES_INDICES else None,
+                skip_errors=True
+            )
+            self._pick_vao_of = self.vao
+
+        # run the regular draw with the picking program swapped in, and
+        # without culling as primitive ids count from the start of a draw
+        state = self.program, self.vao, self._uniforms, self.children, self.cull
+        self.program = self._pick_entry.program
+        self.vao = self._pick_vao
+        self._uniforms = self._pick_entry.uniforms
+        self.children = []
+        self.cull = False
+        try:
+            self.set_uniform('node_id', node_id)
+            # the draw of the class, as a profiler times the instance's own
+            type(self).draw(self, camera)
+        finally:
+            self.program, self.vao, self._uniforms, self.children, self.cull = state
+        for child in self.children:
+            child.draw_pick(camera, node_id)
+
+    def picked_point(self, primitive: int) -> int:
+        """Get the point drawn by a primitive of the picking pass
+
+        Parameters
+        ----------
+        primitive : int
+            The index of the primitive (point, segment or triangle)
+
+        Returns
+        -------
+        index : int
+            The index of the first point of the primitive
+        """
+        vertex = primitive * PRIMITIVE_VERTICES.get(self.DRAW_MODE, 1)
+        if self.REQUIRES_INDICES:
+            return int(self.variables['indices'].flat[vertex])
+        return vertex
+
+    @property
+    def n_vertices(self) -> int:
+        """The number of vertices (or indices) submitted per draw"""
+        if self.REQUIRES_INDICES:
+            return self.variables['indices'].size if 'indices' in self.variables else 0
+        return self.n_points
+
+    def write_buffer(self, name: str, data: np.ndarray) -> moderngl.Buffer:
+        """Write data into a persistent buffer
+
+        The buffer is created on first use. Afterwards it is rewritten in
+        place, or orphaned and refilled when the size changes, so the GPU
+        object (and any vertex array bound to it) stays alive across frames.
+
+        Parameters
+        ----------
+        name : str
+            The key of the buffer in self.buffers
+        data : np.ndarray
+            The data to upload, already in its GPU dtype
+        """
+        if self.ctx is None:
+            raise ValueError('No context set')
+        data = np.ascontiguousarray(data)
+        buffer = self.buffers.get(name)
+        if buffer is None:
+            buffer = self.ctx.buffer(data)
+            self.buffers[name] = buffer
+            self._vao_stale = True
+        else:
+            if buffer.size != data.nbytes:
+                buffer.orphan(data.nbytes)
+            buffer.write(data)
+        self.bytes_uploaded += data.nbytes
+        self._dirty.discard(name)
+        return buffer
+
+    def pack(self, names: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """Convert the CPU-side variables into the arrays uploaded to each buffer
+
+        This only touches numpy data, so it can run off the GUI thread.
+
+        Parameters
+        ----------
+        names : Sequence[str]
+            The buffers to pack. All of them by default.
+
+        Returns
+        -------
+        packed : Dict[str, np.ndarray]
+            The upload-ready array of each buffer
+        """
+        if names is None:
+            names = (*self.ATTRIBUTES, 'indices')
+        packed = {}
+        for name in names:
+            if name in self.ATTRIBUTES:
+                value = self.variables.get(name)
+                if value is None or (name == 'alphas' and self._rgba8_colors()):
+                    continue
+                if name == 'colors' and self._rgba8_colors():
+                    packed[name] = self._pack_rgba8()
+                else:
+                    packed[name] = np.ascontiguousarray(value, dtype='f4')
+            elif name == 'indices' and self.REQUIRES_INDICES:
+                packed[name] = np.ascontiguousarray(self.variables[name], dtype='i4')
+        return packed
+
+    def adopt(self, other: 'Node', packed: Optional[Dict[str, np.ndarray]] = None) -> None:
+        """Take over the CPU-side data of another node of the same type
+
+        This lets the data be prepared, and packed, on a node without a
+        context in a worker thread, leaving only the buffer writes to the
+        thread that draws.
+
+        Parameters
+        ----------
+        other : Node
+            The node to take the data from
+        packed : Dict[str, np.ndarray]
+            The result of other.pack(), uploaded as-is on the next draw
+        """
+        if type(other) is not type(self):
+            raise ValueError(f'Cannot adopt the data of a {type(other).__name__}')
+        for attribute in self.DATA_ATTRIBUTES:
+            setattr(self, attribute, getattr(other, attribute))
+        self._packed = dict(packed or {})
+        self.mark_dirty()
+
     def prepare_vao(self) -> None:
         """Get the vertex array object
+
+        Only the buffers flagged as dirty since the last draw are uploaded.
         """
         if self.ctx is None:
             raise ValueError('No context set')
-        data = np.concatenate([
-            self.variables['points'], 
-            self.variables['colors'], 
-            self.variables['alphas']
-        ], axis=1)
-        if len(data) == 0:
-            self.vao = None
-        vbo = self.ctx.buffer(data.astype('f4').tobytes())
-        if self.REQUIRES_INDICES:
-            ibo = self.ctx.buffer(self.variables['indices'].astype('i4').tobytes())
+        if self.n_points == 0:
+            return
+        dirty = [name for name in self.ATTRIBUTES if name in self._dirty]
+        if self.REQUIRES_INDICES and 'indices' in self._dirty:
+            dirty.append('indices')
+        if dirty:
+            packed = {name: self._packed.pop(name) for name in dirty if name in self._packed}
+            packed.update(self.pack([name for name in dirty if name not in packed]))
+            for name, data in packed.items():
+                self.write_buffer(name, data)
+        layout = self.attribute_layout()
+        if self._vao_stale or self.vao is None or layout != self._vao_layout:
+            if self.vao is not None:
+                self.vao.release()
+            self.vao = self.ctx.vertex_array(
+                self.program,
+                self.vertex_array_content(),
+                index_buffer=self.buffers.get('indices') if self.REQUIRES_INDICES else None
+            )
+            self._vao_stale = False
+            self._vao_layout = layout
+
+    def _rgba8_colors(self) -> bool:
+        """Whether the colors are uint8, uploaded as RGBA8 with the alphas"""
+        colors = self.variables.get('colors') if hasattr(self, 'variables') else None
+        return colors is not None and colors.dtype == np.uint8
+
+    def _per_point(self, name: str) -> bool:
+        """Whether an attribute is uploaded per point rather than as a constant"""
+        value = self.variables.get(name)
+        if name == 'colors':
+            alphas = self.variables.get('alphas')
+            return value.ndim == 2 or (self._rgba8_colors() and alphas is not None and alphas.ndim == 2)
+        return value.ndim >= 1
+
+    def _pack_rgba8(self) -> np.ndarray:
+        """The RGBA8 colors, their alpha byte set from the alphas if there are any"""
+        colors = self.variables['colors']
+        alphas = self.variables.get('alphas')
+        rgba = np.empty((self.n_points, 4) if self._per_point('colors') else (4,), dtype=np.uint8)
+        rgba[..., :3] = colors[..., :3]
+        if alphas is not None:
+            rgba[..., 3:] = np.round(np.clip(alphas, 0, 1) * 255)
+        elif colors.shape[-1] == 4:
+            rgba[..., 3] = colors[..., 3]
         else:
-            ibo = None
-        self.vao = self.ctx.vertex_array(
-            self.program,
-            [
-                (vbo, '3f 3f 1f', 'position', 'color', 'alpha')
-            ],
-            index_buffer=ibo
-        )
+            rgba[..., 3] = 255
+        return rgba
+
+    def attribute_layout(self) -> tuple:
+        """How each attribute is stored: missing, constant, per point, and its dtype"""
+        layout = []
+        for name in self.ATTRIBUTES:
+            value = self.variables.get(name) if hasattr(self, 'variables') else None
+            if value is None:
+                layout.append(None)
+            else:
+                layout.append((self._per_point(name), value.dtype == np.uint8))
+        return tuple(layout)
+
+    def vertex_array_content(self) -> list:
+        """The (buffer, format, *attributes) bindings of the vertex array
+
+        Colors and alphas without a buffer read a constant white and opaque
+        value, constant ones are read once per draw ('/r'), and uint8 colors
+        are read as normalized RGBA, the alphas included.
+        """
+        content = []
+        rgba8 = self._rgba8_colors()
+        alpha_attribute = self.ATTRIBUTES['alphas'][1]
+        for name, (fmt, attribute) in self.ATTRIBUTES.items():
+            value = self.variables.get(name)
+            base, _, divisor = fmt.partition('/')
+            if name == 'alphas' and rgba8:
+                continue
+            if value is None:
+                if name == 'colors':
+                    content.append((constant_buffer(self.ctx), '3f1/r', attribute))
+                elif name == 'alphas':
+                    content.append((constant_buffer(self.ctx), '1f1/r', attribute))
+                continue
+            if not self._per_point(name):
+                divisor = 'r'
+            suffix = f'/{divisor}' if divisor else ''
+            if name == 'colors' and rgba8:
+                content.append((self.buffers[name], f'3f1 1f1{suffix}', attribute, alpha_attribute))
+            else:
+                content.append((self.buffers[name], base + suffix, attribute))
+        return content
+
+    def _bind_colormap(self) -> None:
+        """Bind the texture of self.colormap to the colormap sampler"""
+        cached = self._colormap_texture
+        if cached is None or cached[0] is not self.colormap or cached[1] is not self.ctx:
+            cached = self.colormap, self.ctx, colormap_texture(self.ctx, self.colormap)
+            self._colormap_texture = cached
+        cached[2].use(COLORMAP_UNIT)
+        self.set_uniform('colormap', COLORMAP_UNIT)
+
+    def _prepare_color_uniforms(self) -> None:
+        """Bind the colormap of scalars, or switch the program to plain colors"""
+        scalars = self.variables.get('scalars') if hasattr(self, 'variables') else None
+        self.set_uniform('use_colormap', scalars is not None)
+        if scalars is None:
+            return
+        self._bind_colormap()
+        vmin, vmax = self.clim if self.clim is not None else (0.0, 1.0)
+        if vmax == vmin:
+            vmax = vmin + 1.0
+        self.set_uniform('clim', (vmin, vmax))
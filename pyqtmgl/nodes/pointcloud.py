@@ -1,4 +1,5 @@
-from typing import Optional
+from typing import Literal, Optional, Sequence
+import weakref
 
 import moderngl
 import numpy as np
@@ -24,10 +25,21 @@ class Pointcloud(Node):
             The context to use
         points : np.ndarray (N, 3)
             The points to render
-        colors : np.ndarray (N, 3)
-            The colors of the points (RGB) ranging from 0 to 1
-        alphas : np.ndarray (N,)
+        colors : np.ndarray (3,), (N, 3) or (N, 4) uint8
+            The colors of the points (RGB) ranging from 0 to 1, or as
+            uint8 RGB(A), uploaded as 4 bytes per point with the alphas.
+            The alpha of RGBA colors replaces any previous alphas.
+        alphas : float or np.ndarray (N,)
             The alpha values of the points ranging from 0 to 1
+        scalars : np.ndarray (N,)
+            Values mapped through colormap between the clim limits,
+            drawn instead of colors. Changing the colormap or the limits
+            uploads nothing per point.
+        colormap : str or np.ndarray (K, 3|4)
+            A name from pyqtmgl.colormaps.COLORMAPS or a table of colors
+        clim : Tuple[float, float]
+            The values mapped to the two ends of the colormap. Defaults to
+            the range of the first scalars.
         """
         super().__init__(ctx, 'pointcloud')
 
@@ -47,4 +59,216 @@ class Pointcloud(Node):
         if self.n_points == 0:
             raise ValueError('No points to render')
         self.ctx.point_size = self.size
-        super().draw(camera)
\ No newline at end of file
+        super().draw(camera)
+
+
+MARKERS = ('circle', 'square', 'triangle', 'cross')
+CIRCLE_SEGMENTS = 24
+
+def _fan(rim: np.ndarray) -> np.ndarray:
+    """Triangulate a convex outline into (x, y, edge) vertices fanning from the centre"""
+    nxt = np.roll(rim, -1, axis=0)
+    centre = np.zeros_like(rim)
+    triangles = np.stack([centre, rim, nxt], axis=1) # (T, 3, 2)
+    edge = np.broadcast_to([0, 1, 1], triangles.shape[:2])
+    return np.concatenate([triangles, edge[..., None]], axis=2).reshape(-1, 3)
+
+def marker_template(marker: str) -> np.ndarray:
+    """Get the triangles of a marker of unit radius
+
+    Parameters
+    ----------
+    marker : str
+        One of 'circle', 'square', 'triangle' or 'cross'
+
+    Returns
+    -------
+    vertices : np.ndarray (V, 3)
+        The x and y of each vertex, and its edge coordinate: 0 at the
+        centre and 1 on the outline
+    """
+    if marker == 'circle':
+        theta = np.linspace(0, 2 * np.pi, CIRCLE_SEGMENTS, endpoint=False)
+        vertices = _fan(np.stack([np.cos(theta), np.sin(theta)], axis=1))
+    elif marker == 'square':
+        vertices = _fan(np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]]) / np.sqrt(2))
+    elif marker == 'triangle':
+        theta = np.pi / 2 + np.array([0, 2, 4]) * np.pi / 3
+        vertices = _fan(np.stack([np.cos(theta), np.sin(theta)], axis=1))
+    elif marker == 'cross':
+        # two bars a third of the marker wide; outlines are not drawn
+        w = 1 / 3
+        bar = np.array([[-1, -w], [1, -w], [1, w], [-1, -w], [1, w], [-1, w]])
+        vertices = np.concatenate([bar, bar[:, ::-1]])
+        vertices = np.concatenate([vertices, np.zeros((len(vertices), 1))], axis=1)
+    else:
+        raise ValueError(f'Marker must be one of {MARKERS}')
+    return vertices.astype('f4')
+
+_TEMPLATE_BUFFERS = weakref.WeakKeyDictionary()
+
+def template_buffer(ctx: moderngl.Context, marker: str) -> moderngl.Buffer:
+    """Get the vertex buffer of a marker template, built once per context"""
+    buffers = _TEMPLATE_BUFFERS.setdefault(ctx, {})
+    if marker not in buffers:
+        buffers[marker] = ctx.buffer(marker_template(marker))
+    return buffers[marker]
+
+class MarkerCloud(Pointcloud):
+    VERTEX="""
+    #version 330
+    layout(std140) uniform Camera {
+        mat4 projection;
+        mat4 view;
+    };
+    uniform mat4 model;
+    uniform vec2 viewport;
+    uniform bool use_colormap;
+    uniform sampler2D colormap;
+    uniform vec2 clim;
+    in vec2 corner;
+    in float edge;
+    in vec3 position;
+    in float size;
+    in vec3 color;
+    in float alpha;
+    in float scalar;
+    out vec4 f_color;
+    out float f_edge;
+    out float f_size;
+    flat out uint f_instance;
+    void main() {
+        vec4 centre = projection * view * model * vec4(position, 1.0);
+        // size is a diameter in pixels; clip space spans 2 units per viewport
+        gl_Position = centre + vec4(corner * size / viewport * centre.w, 0.0, 0.0);
+        if (use_colormap) {
+            float n = float(textureSize(colormap, 0).x);
+            float t = clamp((scalar - clim.x) / (clim.y - clim.x), 0.0, 1.0);
+            vec4 mapped = textureLod(colormap, vec2((t * (n - 1.0) + 0.5) / n, 0.5), 0.0);
+            f_color = vec4(mapped.rgb, mapped.a * alpha);
+        } else {
+            f_color = vec4(color, alpha);
+        }
+        f_edge = edge;
+        f_size = size;
+        f_instance = uint(gl_InstanceID);
+    }
+    """
+    FRAGMENT="""
+    #version 330
+    uniform vec4 outline_color;
+    uniform float outline_width;
+    in vec4 f_color;
+    in float f_edge;
+    in float f_size;
+    out vec4 color;
+    void main() {
+        float radius = 0.5 * f_size;
+        if (outline_width > 0.0 && f_edge * radius > radius - outline_width) {
+            color = outline_color;
+        } else {
+            color = f_color;
+        }
+    }
+    """
+    # primitives are template triangles, so the instance is written instead
+    PICK_FRAGMENT="""
+    #version 330
+    uniform uint node_id;
+    flat in uint f_instance;
+    out uvec2 pick;
+    void main() {
+        pick = uvec2(node_id, f_instance + 1u);
+    }
+    """
+    ATTRIBUTES = {
+        'points': ('3f/i', 'position'),
+        'sizes': ('1f/i', 'size'),
+        'colors': ('3f/i', 'color'),
+        'alphas': ('1f/i', 'alpha'),
+        'scalars': ('1f/i', 'scalar'),
+    }
+    def __init__(self, 
+        ctx: Optional[moderngl.Context],
+        points: Optional[np.ndarray]=None,
+        colors: Optional[ArrayLike]=None,
+        alphas: Optional[ArrayLike]=None,
+        sizes: Optional[ArrayLike]=None,
+        marker: Literal['circle', 'square', 'triangle', 'cross']='circle',
+        size = 5,
+        outline_color: Sequence[float] = (0, 0, 0, 1),
+        outline_width: float = 0,
+        **kwargs
+    ):
+        """Pointcloud drawn as instanced marker meshes with per-point sizes
+
+        A single template mesh is instanced over a per-point buffer of
+        position, size, color and alpha, so the whole cloud is one draw call
+        whatever the sizes.
+
+        Parameters
+        ----------
+        ctx : moderngl.Context
+            The context to use
+        points : np.ndarray (N, 3)
+            The points to render
+        colors : np.ndarray (N, 3) or (N, 4) uint8
+            The colors of the points, see Pointcloud
+        alphas : np.ndarray (N,)
+            The alpha values of the points ranging from 0 to 1
+        sizes : float or np.ndarray (N,)
+            The diameter of each marker in pixels. Defaults to size.
+        marker : str
+            One of 'circle', 'square', 'triangle' or 'cross'
+        size : float
+            The diameter of the markers without a per-point size
+        outline_color : Sequence[float] (4,)
+            The color of the outlines (RGBA)
+        outline_width : float
+            The width of the outlines in pixels. Crosses have no outline.
+        """
+        if marker not in MARKERS:
+            raise ValueError(f'Marker must be one of {MARKERS}')
+        self.marker = marker
+        self.outline_color = tuple(outline_color)
+        self.outline_width = outline_width
+        super().__init__(ctx, points, colors, alphas, size=size, sizes=sizes, **kwargs)
+        self.name = 'markercloud'
+
+    def update_variables(self, **kwargs):
+        sizes = kwargs.pop('sizes', None)
+        marker = kwargs.pop('marker', None)
+        super().update_variables(**kwargs)
+        if sizes is not None:
+            sizes = np.asarray(sizes, dtype='f4')
+            if sizes.ndim != 0 and sizes.shape != (self.n_points,):
+                raise ValueError('Sizes must be a scalar or of shape (N,)')
+            self.variables['sizes'] = sizes
+            self.mark_dirty('sizes')
+        if marker is not None and marker != self.marker:
+            if marker not in MARKERS:
+                raise ValueError(f'Marker must be one of {MARKERS}')
+            self.marker = marker
+            self._vao_stale = True
+
+    def picked_point(self, primitive: int) -> int:
+        return primitive
+
+    def vertex_array_content(self) -> list:
+        content = [
+            (template_buffer(self.ctx, self.marker), '2f 1f', 'corner', 'edge'),
+            *super().vertex_array_content()
+        ]
+        if self.variables.get('sizes') is None:
+            # every marker is self.size wide, read once per draw
+            size = self.write_buffer('sizes', np.array([self.size], dtype='f4'))
+            content.append((size, '1f/r', 'size'))
+        return content
+
+    def render(self, camera: Camera) -> None:
+        viewport = self.ctx.viewport
+        self.set_uniform('viewport', (float(viewport[2]), float(viewport[3])))
+        self.set_uniform('outline_color', self.outline_color)
+        self.set_uniform('outline_width', float(self.outline_width))
+        n_template = template_buffer(self.ctx, self.marker).size // 12
+        self.vao.render(moderngl.TRIANGLES, vertices=n_template, instances=self.n_points)
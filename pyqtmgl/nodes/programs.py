@@ -0,0 +1,105 @@
+from typing import Dict, Optional, Tuple
+import weakref
+
+import moderngl
+
+# the uniform block binding point the camera matrices are published at
+CAMERA_BINDING = 0
+
+class ProgramEntry:
+    def __init__(self, program: moderngl.Program):
+        """A cached program shared by every node compiled from the same sources
+
+        Attributes
+        ----------
+        program : moderngl.Program
+            The linked program
+        uniforms : dict
+            The last value written to each uniform by any of its users
+        refs : int
+            The number of users holding the program
+        """
+        self.program = program
+        self.uniforms: Dict[str, object] = {}
+        self.refs = 0
+
+_PROGRAMS: 'weakref.WeakKeyDictionary[moderngl.Context, Dict[Tuple, ProgramEntry]]' = weakref.WeakKeyDictionary()
+
+def acquire_program(
+    ctx: moderngl.Context,
+    vertex_shader: str,
+    fragment_shader: Optional[str]=None,
+    geometry_shader: Optional[str]=None
+) -> ProgramEntry:
+    """Get the program linked from the given sources, compiling it on first use
+
+    Every call must be matched by a call to release_program.
+    """
+    programs = _PROGRAMS.setdefault(ctx, {})
+    key = (vertex_shader, fragment_shader, geometry_shader)
+    entry = programs.get(key)
+    if entry is None:
+        entry = ProgramEntry(ctx.program(
+            vertex_shader=vertex_shader,
+            fragment_shader=fragment_shader,
+            geometry_shader=geometry_shader
+        ))
+        block = entry.program.get('Camera', None)
+        if block is not None:
+            block.binding = CAMERA_BINDING
+        programs[key] = entry
+    entry.refs += 1
+    return entry
+
+def release_program(ctx: moderngl.Context, entry: ProgramEntry) -> None:
+    """Drop a reference to a program, releasing it when the last user goes away"""
+    entry.refs -= 1
+    if entry.refs > 0:
+        return
+    programs = _PROGRAMS.get(ctx, {})
+    for key, value in list(programs.items()):
+        if value is entry:
+            del programs[key]
+    entry.program.release()
+
+def cached_programs(ctx: moderngl.Context) -> int:
+    """The number of programs currently cached for a context"""
+    return len(_PROGRAMS.get(ctx, {}))
+
+
+class CameraBlock:
+    def __init__(self, ctx: moderngl.Context):
+        """The uniform buffer holding the projection and view of the camera drawn with
+
+        Every program declaring the Camera uniform block reads it, so the
+        matrices are uploaded once per camera change rather than once per
+        node.
+
+        Parameters
+        ----------
+        ctx : moderngl.Context
+            The context to create the buffer in
+        """
+        # two std140 mat4, column-major like glm
+        self.buffer = ctx.buffer(reserve=128)
+        self.buffer.bind_to_uniform_block(CAMERA_BINDING)
+        self.camera: Optional[weakref.ref] = None
+        self.version = -1
+
+    def publish(self, camera) -> None:
+        """Upload the matrices of a camera unless they are already in the buffer"""
+        if self.camera is not None and self.camera() is camera and self.version == camera.version:
+            return
+        projection, view = camera.get_matrices()
+        self.buffer.write(projection.to_bytes() + view.to_bytes())
+        self.buffer.bind_to_uniform_block(CAMERA_BINDING)
+        self.camera = weakref.ref(camera)
+        self.version = camera.version
+
+_CAMERA_BLOCKS: 'weakref.WeakKeyDictionary[moderngl.Context, CameraBlock]' = weakref.WeakKeyDictionary()
+
+def camera_block(ctx: moderngl.Context) -> CameraBlock:
+    """Get the camera uniform buffer of a context, created on first use"""
+    if ctx not in _CAMERA_BLOCKS:
+        _CAMERA_BLOCKS[ctx] = CameraBlock(ctx)
+    return _CAMERA_BLOCKS[ctx]
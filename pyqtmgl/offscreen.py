@@ -0,0 +1,185 @@
+import struct
+import zlib
+from typing import Dict, Optional, Sequence, Tuple
+
+import moderngl
+import numpy as np
+
+from pyqtmgl.cameras import Camera
+from pyqtmgl.nodes.node import Node
+from pyqtmgl.nodes.programs import ProgramEntry, acquire_program, release_program
+
+def create_headless_context(backend: Optional[str] = None) -> moderngl.Context:
+    """Create a standalone OpenGL 3.3 context without a window
+
+    EGL is tried first as it needs no display server and runs on software
+    rasterizers such as llvmpipe; the platform's default is used otherwise.
+
+    Parameters
+    ----------
+    backend : str
+        Force a moderngl backend, e.g. 'egl'
+    """
+    if backend is not None:
+        return moderngl.create_standalone_context(backend=backend, require=330)
+    try:
+        return moderngl.create_standalone_context(backend='egl', require=330)
+    except Exception:
+        return moderngl.create_standalone_context(require=330)
+
+def encode_png(image: np.ndarray) -> bytes:
+    """Encode an (H, W, 4) or (H, W, 3) uint8 image as PNG"""
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    if image.ndim != 3 or image.shape[2] not in (3, 4):
+        raise ValueError('Image must be of shape (H, W, 3) or (H, W, 4)')
+    height, width, channels = image.shape
+    # every row starts with the filter type, 0 for none
+    rows = np.concatenate([np.zeros((height, 1), dtype=np.uint8), image.reshape(height, -1)], axis=1)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    color_type = 6 if channels == 4 else 2
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)),
+        chunk(b'IDAT', zlib.compress(rows.tobytes(), 6)),
+        chunk(b'IEND', b''),
+    ])
+
+class OffscreenRenderer:
+    def __init__(self,
+        size: Tuple[int, int] = (800, 600),
+        bg: Tuple[float, float, float, float] = (0.0, 0.0, 0.0, 1.0),
+        samples: int = 0,
+        ctx: Optional[moderngl.Context] = None
+    ):
+        """Render nodes to images without Qt or a display
+
+        The context, framebuffers and the programs of every node type drawn
+        are kept for the lifetime of the renderer, so rendering many images
+        only costs the uploads, the draw and the readback of each.
+
+        Parameters
+        ----------
+        size : Tuple[int, int]
+            The default width and height of the images
+        bg : Tuple[float, float, float, float]
+            The background color (RGBA)
+        samples : int
+            The number of samples for multisampling, 0 to disable it
+        ctx : moderngl.Context
+            The context to use. A headless one is created by default.
+        """
+        self.ctx = ctx if ctx is not None else create_headless_context()
+        self.size = tuple(size)
+        self.bg = bg
+        self.samples = samples
+        self._framebuffers: Dict[Tuple[int, int], Tuple[moderngl.Framebuffer, Optional[moderngl.Framebuffer]]] = {}
+        self._programs: Dict[type, ProgramEntry] = {}
+
+    def framebuffers(self, size: Tuple[int, int]) -> Tuple[moderngl.Framebuffer, Optional[moderngl.Framebuffer]]:
+        """Get the framebuffer drawn into and, if multisampled, the one it resolves to"""
+        if size not in self._framebuffers:
+            draw = self.ctx.framebuffer(
+                color_attachments=[self.ctx.renderbuffer(size, 4, samples=self.samples)],
+                depth_attachment=self.ctx.depth_renderbuffer(size, samples=self.samples)
+            )
+            resolve = self.ctx.simple_framebuffer(size) if self.samples else None
+            self._framebuffers[size] = draw, resolve
+        return self._framebuffers[size]
+
+    def render(self,
+        nodes: Sequence[Node],
+        camera: Camera,
+        size: Optional[Tuple[int, int]] = None
+    ) -> np.ndarray:
+        """Draw nodes and read back the image
+
+        Nodes without a context, or with another one, are attached to the
+        renderer's context.
+
+        Parameters
+        ----------
+        nodes : Sequence[Node]
+            The nodes to draw, in order
+        camera : Camera
+            The camera to draw with
+        size : Tuple[int, int]
+            The width and height of the image. Defaults to self.size.
+
+        Returns
+        -------
+        image : np.ndarray (H, W, 4)
+            The RGBA image, as uint8, from the top row down
+        """
+        size = tuple(size) if size is not None else self.size
+        width, height = size
+        draw, resolve = self.framebuffers(size)
+        draw.use()
+        draw.clear(*self.bg)
+        camera.set_size(width, height)
+        for node in nodes:
+            if node.ctx is not self.ctx:
+                node.set_context(self.ctx)
+            self.keep_program(node)
+            node.set_size(width, height)
+            if node.n_vertices == 0:
+                continue
+            node.draw(camera)
+        if resolve is not None:
+            self.ctx.copy_framebuffer(resolve, draw)
+            draw = resolve
+        data = draw.read(components=4)
+        return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 4)[::-1]
+
+    def render_png(self,
+        nodes: Sequence[Node],
+        camera: Camera,
+        size: Optional[Tuple[int, int]] = None
+    ) -> bytes:
+        """Draw nodes and encode the image as PNG"""
+        return encode_png(self.render(nodes, camera, size))
+
+    def save(self,
+        path: str,
+        nodes: Sequence[Node],
+        camera: Camera,
+        size: Optional[Tuple[int, int]] = None
+    ) -> None:
+        """Draw nodes and write the image to a PNG file"""
+        with open(path, 'wb') as f:
+            f.write(self.render_png(nodes, camera, size))
+
+    def keep_program(self, node: Node) -> None:
+        """Hold the program of a node type so it outlives the node"""
+        cls = type(node)
+        if cls not in self._programs:
+            self._programs[cls] = acquire_program(self.ctx, cls.VERTEX, cls.FRAGMENT, cls.GEOMETRY)
+
+    def release(self) -> None:
+        """Release the framebuffers and programs held by the renderer
+
+        The nodes drawn keep their own resources and must be released
+        separately.
+        """
+        for draw, resolve in self._framebuffers.values():
+            for framebuffer in (draw, resolve):
+                if framebuffer is None:
+                    continue
+                for attachment in (*framebuffer.color_attachments, framebuffer.depth_attachment):
+                    attachment.release()
+                if self.ctx.fbo is framebuffer:
+                    # deleting the bound framebuffer binds the default one
+                    self.ctx.fbo = self.ctx.screen
+                framebuffer.release()
+        self._framebuffers = {}
+        for entry in self._programs.values():
+            release_program(self.ctx, entry)
+        self._programs = {}
+
+    def __enter__(self) -> 'OffscreenRenderer':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.release()
@@ -0,0 +1,106 @@
+from typing import Optional, Sequence, Tuple
+
+import moderngl
+import numpy as np
+
+from pyqtmgl.cameras import Camera
+from pyqtmgl.nodes.node import Node
+
+class PickBuffer:
+    def __init__(self, ctx: moderngl.Context):
+        """Offscreen integer framebuffer the nodes are drawn into for picking
+
+        Every pixel holds the (node id, primitive + 1) of the closest
+        fragment, so only a few pixels around the cursor need to be read
+        back, whatever the size of the scene.
+
+        Parameters
+        ----------
+        ctx : moderngl.Context
+            The context to use
+        """
+        self.ctx = ctx
+        self.framebuffer: Optional[moderngl.Framebuffer] = None
+
+    def resize(self, size: Tuple[int, int]) -> moderngl.Framebuffer:
+        """Get the framebuffer, re-creating it if the size changed"""
+        if self.framebuffer is not None and self.framebuffer.size != tuple(size):
+            self.release()
+        if self.framebuffer is None:
+            self.framebuffer = self.ctx.framebuffer(
+                color_attachments=[self.ctx.texture(size, 2, dtype='u4')],
+                depth_attachment=self.ctx.depth_renderbuffer(size)
+            )
+        return self.framebuffer
+
+    def release(self) -> None:
+        if self.framebuffer is None:
+            return
+        for attachment in (*self.framebuffer.color_attachments, self.framebuffer.depth_attachment):
+            attachment.release()
+        if self.ctx.fbo is self.framebuffer:
+            # deleting the bound framebuffer binds the default one
+            self.ctx.fbo = self.ctx.screen
+        self.framebuffer.release()
+        self.framebuffer = None
+
+    def pick(self,
+        nodes: Sequence[Node],
+        camera: Camera,
+        size: Tuple[int, int],
+        pos: Tuple[int, int],
+        radius: int = 3
+    ) -> Optional[Tuple[Node, int]]:
+        """Find the node and point drawn closest to a pixel
+
+        Parameters
+        ----------
+        nodes : Sequence[Node]
+            The nodes to pick from, drawn in order
+        camera : Camera
+            The camera the nodes are drawn with
+        size : Tuple[int, int]
+            The width and height of the view in pixels
+        pos : Tuple[int, int]
+            The pixel, from the top left corner of the view
+        radius : int
+            The half-width in pixels of the square searched around pos
+
+        Returns
+        -------
+        node : Node
+            The node drawn at or nearest to pos
+        index : int
+            The index of the point of the node
+        None is returned if nothing was drawn within radius.
+        """
+        framebuffer = self.resize(size)
+        # the viewport is stored per framebuffer: restore the caller's only
+        # once its framebuffer is bound again
+        previous, viewport = self.ctx.fbo, self.ctx.viewport
+        framebuffer.viewport = (0, 0, *size)
+        framebuffer.use()
+        framebuffer.clear(0, 0, 0, 0, depth=1.0)
+        for node_id, node in enumerate(nodes, start=1):
+            if node is not None and node.ctx is not None:
+                node.draw_pick(camera, node_id)
+        if previous is not None:
+            previous.use()
+            self.ctx.viewport = viewport
+
+        # read back the square around pos; rows go from the bottom up
+        width, height = size
+        x, y = int(pos[0]), height - 1 - int(pos[1])
+        x0, y0 = max(0, x - radius), max(0, y - radius)
+        x1, y1 = min(width, x + radius + 1), min(height, y + radius + 1)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        data = framebuffer.read(viewport=(x0, y0, x1 - x0, y1 - y0), components=2, dtype='u4')
+        ids = np.frombuffer(data, dtype='u4').reshape(y1 - y0, x1 - x0, 2)
+        rows, cols = np.nonzero(ids[..., 0])
+        if rows.size == 0:
+            return None
+        nearest = np.argmin((rows + y0 - y) ** 2 + (cols + x0 - x) ** 2)
+        node_id, primitive = ids[rows[nearest], cols[nearest]]
+        node = nodes[node_id - 1]
+        return node, node.picked_point(int(primitive) - 1)
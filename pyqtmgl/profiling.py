@@ -0,0 +1,178 @@
+from collections import deque
+import time
+from typing import Deque, Dict, List, Optional, Tuple
+import weakref
+
+import moderngl
+import numpy as np
+
+from pyqtmgl.nodes.node import Node
+
+# the timed calls of a node, timed on the CPU, plus the GPU time of its draw;
+# 'pick' is draw_pick, kept apart so picking does not count as drawing
+TIMINGS = ('update_variables', 'prepare_vao', 'draw', 'gpu', 'pick')
+DEFAULT_WINDOW = 120
+
+class NodeStats:
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        """Rolling timings and counters of a node over its last draws
+
+        Attributes
+        ----------
+        times : Dict[str, Deque[float]]
+            The last durations, in milliseconds, of each of TIMINGS
+        bytes_uploaded : Deque[int]
+            The bytes written to the GPU by each draw
+        vertices : Deque[int]
+            The vertices (or indices) submitted by each draw
+        """
+        self.times: Dict[str, Deque[float]] = {key: deque(maxlen=window) for key in TIMINGS}
+        self.bytes_uploaded: Deque[int] = deque(maxlen=window)
+        self.vertices: Deque[int] = deque(maxlen=window)
+        self.query: Optional[moderngl.Query] = None
+
+    def summary(self) -> Dict[str, float]:
+        """The mean and 95th percentile of each timing, and the mean counters
+
+        Keys are '<timing>_mean' and '<timing>_p95' in milliseconds, then
+        'bytes_uploaded' and 'vertices' per draw. Timings without samples
+        are left out.
+        """
+        summary = {}
+        for key, values in self.times.items():
+            if values:
+                summary[f'{key}_mean'] = float(np.mean(values))
+                summary[f'{key}_p95'] = float(np.percentile(values, 95))
+        summary['bytes_uploaded'] = float(np.mean(self.bytes_uploaded)) if self.bytes_uploaded else 0.0
+        summary['vertices'] = float(np.mean(self.vertices)) if self.vertices else 0.0
+        return summary
+
+class Profiler:
+    def __init__(self, ctx: Optional[moderngl.Context] = None, window: int = DEFAULT_WINDOW):
+        """Opt-in timing of nodes and frames
+
+        Attached nodes have their update_variables, prepare_vao, draw and
+        draw_pick wrapped on the instance, so nothing is measured, or
+        slowed down, for nodes that are not attached. GPU times come from
+        timer queries that are read back one draw late so they never stall
+        the pipeline.
+
+        Parameters
+        ----------
+        ctx : moderngl.Context
+            The context to create timer queries in. GPU times are not
+            recorded without one.
+        window : int
+            The number of draws (and frames) the statistics are kept over
+        """
+        self.ctx = ctx
+        self.window = window
+        self.stats: 'weakref.WeakKeyDictionary[Node, NodeStats]' = weakref.WeakKeyDictionary()
+        self.frame_times: Deque[float] = deque(maxlen=window)
+        self._frame_start: Optional[float] = None
+        self._last_frame: Optional[float] = None
+        self.frame_intervals: Deque[float] = deque(maxlen=window)
+
+    def attach(self, node: Node) -> None:
+        """Start timing a node. Its children are timed as part of it."""
+        if node in self.stats:
+            return
+        stats = NodeStats(self.window)
+        self.stats[node] = stats
+        for name in ('update_variables', 'prepare_vao'):
+            setattr(node, name, self._timed(getattr(node, name), stats.times[name]))
+        node.draw = self._timed_draw(node, node.draw, stats)
+        node.draw_pick = self._timed(node.draw_pick, stats.times['pick'])
+
+    def detach(self, node: Node) -> None:
+        """Stop timing a node, restoring its methods"""
+        stats = self.stats.pop(node, None)
+        if stats is None:
+            return
+        for name in ('update_variables', 'prepare_vao', 'draw', 'draw_pick'):
+            node.__dict__.pop(name, None)
+
+    def detach_all(self) -> None:
+        for node in list(self.stats.keys()):
+            self.detach(node)
+
+    @staticmethod
+    def _timed(method, times: Deque[float]):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                times.append((time.perf_counter() - start) * 1e3)
+        return timed
+
+    def _timed_draw(self, node: Node, draw, stats: NodeStats):
+        def timed_draw(*args, **kwargs):
+            uploaded = node.bytes_uploaded
+            if stats.query is not None:
+                # the query of the previous draw has long finished by now
+                stats.times['gpu'].append(stats.query.elapsed / 1e6)
+            elif self.ctx is not None:
+                stats.query = self.ctx.query(time=True)
+            start = time.perf_counter()
+            try:
+                if stats.query is not None:
+                    with stats.query:
+                        return draw(*args, **kwargs)
+                return draw(*args, **kwargs)
+            finally:
+                stats.times['draw'].append((time.perf_counter() - start) * 1e3)
+                stats.bytes_uploaded.append(node.bytes_uploaded - uploaded)
+                stats.vertices.append(node.n_vertices)
+        return timed_draw
+
+    def begin_frame(self) -> None:
+        now = time.perf_counter()
+        if self._last_frame is not None:
+            self.frame_intervals.append(now - self._last_frame)
+        self._last_frame = now
+        self._frame_start = now
+
+    def end_frame(self) -> None:
+        if self._frame_start is None:
+            return
+        self.frame_times.append((time.perf_counter() - self._frame_start) * 1e3)
+        self._frame_start = None
+
+    @property
+    def fps(self) -> float:
+        """The frame rate over the last frames drawn"""
+        if not self.frame_intervals:
+            return 0.0
+        return 1.0 / max(float(np.mean(self.frame_intervals)), 1e-9)
+
+    def summary(self) -> Dict[Node, Dict[str, float]]:
+        """The NodeStats.summary of every attached node"""
+        return {node: stats.summary() for node, stats in self.stats.items()}
+
+    def top(self, n: int = 5, key: Optional[str] = None) -> List[Tuple[Node, Dict[str, float]]]:
+        """The n nodes with the largest value of a summary key
+
+        By default nodes are ranked by the larger of their mean CPU and GPU
+        draw times.
+        """
+        def cost(item):
+            summary = item[1]
+            if key is not None:
+                return summary.get(key, 0.0)
+            return max(summary.get('draw_mean', 0.0), summary.get('gpu_mean', 0.0))
+        return sorted(self.summary().items(), key=cost, reverse=True)[:n]
+
+    def report(self, n: int = 5) -> str:
+        """A short text of the frame rate and the most costly nodes"""
+        frame = float(np.mean(self.frame_times)) if self.frame_times else 0.0
+        lines = [f'{self.fps:.0f} FPS, {frame:.2f} ms/frame']
+        for node, summary in self.top(n):
+            line = f'{node}: cpu {summary.get("draw_mean", 0):.2f} ms'
+            if 'gpu_mean' in summary:
+                line += f', gpu {summary["gpu_mean"]:.2f} ms'
+            line += f', {summary["vertices"]:.0f} verts, {summary["bytes_uploaded"] / 1024:.0f} KiB'
+            if 'pick_mean' in summary:
+                line += f', pick {summary["pick_mean"]:.2f} ms'
+            lines.append(line)
+        return '\n'.join(lines)
@@ -18,6 +18,9 @@ class RectTool:
     def set_end(self, point):
         self.corner2 = point
         # the four corners of the rectangle
+        if self.corner1 is not None:
+            verts, indices = self.get_rect()
+            self.line.update_variables(points=verts, indices=indices)
     def reset(self):
         self.corner1 = None
         self.corner2 = None
@@ -31,8 +34,6 @@ class RectTool:
     def draw(self, camera):
         if self.corner1 is None or self.corner2 is None:
             return
-        verts, indices = self.get_rect()
-        self.line.update_variables(points=verts, indices=indices)
         self.line.draw(camera)
 
 
@@ -119,6 +120,8 @@ class ImageViewerWidget(GLWidget):
     def cameras(self):
         yield self.camera
         yield self.screen_camera
+    def scene_state(self):
+        return super().scene_state() + (self.image is not None, self.tool_active)
     def render(self):
         if self.image is not None:
             self.im.draw(self.camera)
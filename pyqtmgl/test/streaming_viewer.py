@@ -0,0 +1,29 @@
+import numpy as np
+from PyQt5 import QtCore
+
+from pyqtmgl.widgets.continuous_viewer import ContinuousViewer
+from pyqtmgl.test.runner import run_dockable
+
+class StreamingViewer(ContinuousViewer):
+    name = "Streaming Viewer"
+
+    def __init__(self, n_lines=10, capacity=int(1e5), blocksize=500):
+        super().__init__()
+        self.blocksize = blocksize
+        self.t = 0
+        self.freqs = (np.arange(n_lines) + 1) * np.pi
+        self.start_stream(n_lines, capacity, scale=1.0)
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.acquire)
+        self.timer.start(10)
+
+    def acquire(self):
+        t = self.t + np.arange(self.blocksize)
+        self.append(np.sin(t[None, :] / self.freqs[:, None] / 10))
+        self.t += self.blocksize
+
+def main():
+    run_dockable([StreamingViewer])
+
+if __name__ == "__main__":
+    main()
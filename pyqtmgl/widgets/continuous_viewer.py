@@ -1,26 +1,77 @@
-from typing import Optional, List, Mapping
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, List, Mapping, Tuple
 
 from PyQt5 import QtCore, QtWidgets, QtGui
 import numpy as np
 
 from pyqtmgl.glwidget import GLWidget
 from pyqtmgl.cameras.rect import RectCamera
-from pyqtmgl.nodes.linecollection import LineCollection
+from pyqtmgl.nodes.linecollection import LineCollection, SampledLineCollection, StreamingLineCollection
+from pyqtmgl.data.pyramid import MinMaxPyramid
+from pyqtmgl.data.sources import ArraySource, as_source
 
 DEFAULT_CHUNK_SIZE = 1e4
+MIN_CHUNK_SIZE = 10
+ZOOM_FACTOR = 2
+# the finest pyramid level kept for out-of-core sources, about 3% of the samples
+OUT_OF_CORE_MIN_LEVEL = 3
+PREFETCH_WORKERS = 2
+PREFETCH_CACHE_SIZE = 8
+# the length, in windows, of the tile kept on the GPU when panning
+TILE_WINDOWS = 8
+# the most samples per channel read raw for a view while its pyramid is built
+RAW_SPAN_LIMIT = 2 ** 20
 WHITE = [1, 1, 1]
 RED = [1, 0, 0]
+def uniform_spacing(x: np.ndarray) -> Optional[Tuple[float, float, int]]:
+    """The (start, period, repeat) of positions that step uniformly
+
+    repeat is 1 if every position is new and 2 if they come in pairs, as
+    min/max pairs do. None is returned for any other spacing.
+    """
+    for repeat in (1, 2):
+        if x.size % repeat or (repeat == 2 and not np.array_equal(x[0::2], x[1::2])):
+            continue
+        steps = x[::repeat]
+        if steps.size < 2:
+            return float(x[0]), 1.0, repeat
+        period = (steps[-1] - steps[0]) / (steps.size - 1)
+        if period > 0 and np.allclose(np.diff(steps), period, rtol=1e-6, atol=0):
+            return float(steps[0]), float(period), repeat
+    return None
+
 class ContinuousViewer(GLWidget):
     name = "Continuous Viewer"
+    PREWARM_NODES = (SampledLineCollection, LineCollection)
 
-    def __init__(self, points=None, colours=None):
+    def __init__(self, points=None, colours=None, resident=True):
+        """
+        Parameters
+        ----------
+        points, colours
+            The recording, see set_data
+        resident : bool
+            Whether to keep a tile of TILE_WINDOWS windows around the view
+            on the GPU, so panning within it only moves the camera and the
+            range drawn. Otherwise every step uploads the window shown.
+        """
         super().__init__()
         self.points = points
         self.colours = colours
+        self.resident = resident
+        self.source = None
+        self.stream = None
+        self.camera = RectCamera()
+        # (start, length, chunklength, n_pixels) of the window or tile in self.line
+        self.tile: Optional[Tuple[int, int, int, int]] = None
+        self.prefetcher = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS)
+        self.windows: 'OrderedDict[Tuple[int, int, int], Future]' = OrderedDict()
+        # the pyramid of an out-of-core source being built in the background
+        self.pyramid_build: Optional[Future] = None
 
     def init(self):
-        self.line = LineCollection(self.ctx)
-        self.camera = RectCamera()
+        self.line = SampledLineCollection(self.ctx)
         if self.points is not None:
             self.set_data(self.points, self.colours)
         
@@ -32,61 +83,370 @@ class ContinuousViewer(GLWidget):
         self.actions["scroll_forward"].setShortcut(QtCore.Qt.Key_Right) 
         # self.actions["scroll_forward"].setShortcutContext(QtCore.Qt.ApplicationShortcut)
         self.actions["scroll_backward"].setShortcut(QtCore.Qt.Key_Left)
+        self.actions["zoom_in"] = QtWidgets.QAction("Zoom In", self)
+        self.actions["zoom_out"] = QtWidgets.QAction("Zoom Out", self)
+        self.actions["zoom_in"].triggered.connect(lambda: self.zoom(1 / ZOOM_FACTOR))
+        self.actions["zoom_out"].triggered.connect(lambda: self.zoom(ZOOM_FACTOR))
+        self.actions["zoom_in"].setShortcut(QtCore.Qt.Key_Up)
+        self.actions["zoom_out"].setShortcut(QtCore.Qt.Key_Down)
 
         for action in self.actions.values():
             self.addAction(action)
 
     def wheelEvent(self, event):
-        if event.angleDelta().y() > 0:
+        if event.modifiers() & QtCore.Qt.ControlModifier:
+            if event.angleDelta().y() > 0:
+                self.actions["zoom_in"].trigger()
+            else:
+                self.actions["zoom_out"].trigger()
+        elif event.angleDelta().y() > 0:
             self.actions["scroll_forward"].trigger()
         else:
             self.actions["scroll_backward"].trigger()
 
-    def move(self, direction):
-        stepsize = 1e3
-        if self.points is None:
-            return
+    def step(self, startidx, direction):
+        """The start of the window one scroll step away from startidx"""
+        stepsize = max(1, self.chunklength // 10)
         if direction == -1:
-            self.startidx = int(max(0, self.startidx - stepsize))
+            return int(max(0, startidx - stepsize))
         elif direction == 1:
-            self.startidx = int(min(self.points.shape[1] - self.chunklength, self.startidx + stepsize))
+            return int(min(self.source.n_samples - self.chunklength, startidx + stepsize))
         else:
             raise ValueError("Direction must be -1 or 1")
+
+    def move(self, direction):
+        if self.source is None:
+            return
+        self.startidx = self.step(self.startidx, direction)
         self.update_trace()
 
-    def set_data(self, points, colours=None):
-        self.points = np.asarray(points)
+    def zoom(self, factor):
+        """Scale the visible window around its centre
+
+        Parameters
+        ----------
+        factor : float
+            The ratio of the new to the current window length
+        """
+        if self.source is None:
+            return
+        n_samples = self.source.n_samples
+        centre = self.startidx + self.chunklength / 2
+        self.chunklength = int(np.clip(self.chunklength * factor, min(MIN_CHUNK_SIZE, n_samples), self.max_chunklength()))
+        self.startidx = int(np.clip(centre - self.chunklength / 2, 0, n_samples - self.chunklength))
+        self.update_trace()
+
+    def max_chunklength(self):
+        """The longest window the view can be zoomed out to
+
+        Until the pyramid built in the background is ready, views are
+        decimated from the raw samples of their window or tile, so windows
+        are kept short enough to read at most RAW_SPAN_LIMIT samples.
+        """
+        n_samples = self.source.n_samples
+        if self.pyramid_build is None or self.pyramid_build.done():
+            return n_samples
+        windows = TILE_WINDOWS if self.resident else 1
+        return max(min(n_samples, RAW_SPAN_LIMIT // windows), min(MIN_CHUNK_SIZE, n_samples))
+
+    def set_data(self, points, colours=None, lod=True):
+        """Show a recording
+
+        Parameters
+        ----------
+        points : array-like (n_channels, n_samples) or DataSource
+            The samples. Sources such as RawFileSource are only read a
+            window at a time.
+        colours : np.ndarray (n_channels, n_samples, 3)
+            The colour of each sample
+        lod : bool
+            Whether to build a min/max pyramid for fast zoomed-out views.
+            Building it reads the whole source once; without it, views are
+            decimated from the raw samples they span. The pyramid of a
+            source other than an array is built in the background, views
+            being decimated from the raw samples, and zooming out limited
+            to max_chunklength, until it is ready.
+        """
+        self.stop_stream()
+        self.clear_windows()
+        self.tile = None
+        self.source = as_source(points)
         if colours is None:
             self.colours = None
         else:
             self.colours = np.asarray(colours)
+        self.set_line_type(LineCollection if self.colours is not None else SampledLineCollection)
+        if self.pyramid_build is not None:
+            self.pyramid_build.cancel()
+            self.pyramid_build = None
+        if lod and isinstance(self.source, ArraySource):
+            self.pyramid = MinMaxPyramid(self.source)
+        else:
+            self.pyramid = MinMaxPyramid(self.source, max_level=0)
+            if lod:
+                # reading the whole file would block the GUI thread
+                self.pyramid_build = self.prefetcher.submit(
+                    MinMaxPyramid, self.source, min_level=OUT_OF_CORE_MIN_LEVEL
+                )
         self.startidx = 0
-        self.chunklength = int(min(DEFAULT_CHUNK_SIZE, self.points.size))
-        self.scale = self.points.max()
+        self.chunklength = int(min(DEFAULT_CHUNK_SIZE, self.source.n_samples))
+        self.scale = self.pyramid.max()
+        self.spacing = 2 * self.scale
+        self.gains = np.ones(self.source.n_channels)
+        self.visible = np.ones(self.source.n_channels, dtype=bool)
         self.update_trace()
     
-    def update_trace(self):
-        chunkslice = slice(self.startidx, self.startidx+self.chunklength)
-        points = self.points[:, chunkslice]
-        n_lines, n_points = points.shape[:2]
-        if self.colours is not None:
-            colours = self.colours[:, chunkslice, :]
+    def prepare_window(self, startidx, chunklength, n_pixels):
+        """Read, decimate and pack the vertices of a window
+
+        Only numpy work happens here, so it runs in the prefetch threads.
+
+        Without colours, the window is a SampledLineCollection holding
+        only the values, in the source dtype.
+
+        Returns
+        -------
+        line : LineCollection or SampledLineCollection
+            A context-less node of the type of self.line holding the window
+        packed : Dict[str, np.ndarray]
+            Its buffers, ready to upload
+        """
+        # at most two vertices per pixel column, whatever the window length
+        x, points = self.pyramid.query(startidx, startidx+chunklength, n_pixels)
+        if self.colours is None:
+            spacing = uniform_spacing(x)
+            if spacing is None:
+                # resample onto a regular grid of as many vertices
+                grid = np.linspace(x[0], x[-1], x.size)
+                points = np.stack([np.interp(grid, x, row) for row in points])
+                spacing = float(x[0]), float(grid[1] - grid[0]), 1
+            start, period, repeat = spacing
+            line = SampledLineCollection(None, points, start=start - startidx, period=period, repeat=repeat)
+            return line, line.pack()
+        sampleidx = np.minimum(x.astype(int), self.source.n_samples - 1)
+        colours = self.colours[:, sampleidx, :]
+
+        # positions are relative to the window to keep float32 precision
+        x = np.broadcast_to(x - startidx, points.shape)
+        line = LineCollection(None, strips=True)
+        line.update_variables(
+            lines=np.stack([x, points], axis=2),
+            vertex_colors=colours.reshape(-1, 3),
+        )
+        return line, line.pack()
+
+    def set_line_type(self, cls):
+        """Replace self.line by an empty node of another type"""
+        line = getattr(self, 'line', None)
+        if type(line) is cls:
+            return
+        if line is not None and line.ctx is not None:
+            self.makeCurrent()
+            line.release()
+            self.doneCurrent()
+        self.line = cls(self.ctx) if cls is SampledLineCollection else cls(self.ctx, strips=True)
+
+    def request_window(self, startidx, prefetch=False, length=None) -> Future:
+        """Get the prepared window starting at startidx
+
+        Windows are kept in a small LRU cache. A missing window is prepared
+        in the background when prefetching, and right away otherwise.
+
+        Parameters
+        ----------
+        startidx : int
+            The first sample of the window
+        prefetch : bool
+            Whether to prepare the window in the background
+        length : int
+            The number of samples of the window, self.chunklength by
+            default. Longer windows are decimated at the same resolution.
+        """
+        if length is None:
+            length = self.chunklength
+        key = (startidx, length, max(1, self.width() * length // self.chunklength))
+        if key in self.windows:
+            self.windows.move_to_end(key)
+            return self.windows[key]
+        if prefetch:
+            future = self.prefetcher.submit(self.prepare_window, *key)
         else:
-            colours = np.ones((n_lines, n_points, 3))
+            future = Future()
+            future.set_result(self.prepare_window(*key))
+        self.windows[key] = future
+        while len(self.windows) > PREFETCH_CACHE_SIZE:
+            _, stale = self.windows.popitem(last=False)
+            stale.cancel()
+        return future
+
+    def clear_windows(self):
+        for future in self.windows.values():
+            future.cancel()
+        self.windows.clear()
+
+    def set_gains(self, gains):
+        """Scale the channels, by a scalar or one gain per channel
+
+        Only the per-line parameters of the lines are uploaded again.
+        """
+        if self.source is None:
+            return
+        self.gains = np.broadcast_to(np.asarray(gains, dtype='f8'), self.gains.shape).copy()
+        self.update_channels()
+
+    def set_spacing(self, spacing):
+        """Set the vertical distance between consecutive channels"""
+        if self.source is None:
+            return
+        self.spacing = float(spacing)
+        self.update_channels()
+        self.update_trace()
+
+    def set_visible(self, visible):
+        """Show or hide channels, by a bool or one per channel"""
+        if self.source is None:
+            return
+        self.visible = np.broadcast_to(np.asarray(visible, dtype=bool), self.visible.shape).copy()
+        self.update_channels()
+
+    def update_channels(self):
+        if self.source is None or self.line.n_lines == 0:
+            return
+        self.line.update_variables(offset=self.spacing, gains=self.gains, visible=self.visible)
+        self.update()
+
+    def tile_span(self, index):
+        """The start and length of a tile
+
+        Tiles are TILE_WINDOWS windows long and start every half of that,
+        so any window lies within the tile of index startidx // stride.
+        """
+        stride = max(self.chunklength, self.chunklength * TILE_WINDOWS // 2)
+        start = index * stride
+        return start, min(2 * stride, self.source.n_samples - start), stride
 
+    def adopt_pyramid(self):
+        """Switch to the pyramid built in the background once it is ready
+
+        Windows already prepared from the raw samples look the same, so
+        they are kept.
+        """
+        build = self.pyramid_build
+        if build is None or not build.done():
+            return
+        self.pyramid_build = None
+        if not build.cancelled() and build.exception() is None:
+            self.pyramid = build.result()
+
+    def update_trace(self):
+        self.adopt_pyramid()
+        if self.resident:
+            self.update_tile()
+        else:
+            line, packed = self.request_window(self.startidx).result()
+            self.line.adopt(line, packed)
+            self.update_channels()
+            self.tile = (self.startidx, self.chunklength, self.chunklength, self.width())
+            for direction in (1, -1):
+                self.request_window(self.step(self.startidx, direction), prefetch=True)
+        left = self.startidx - self.tile[0]
         self.camera.set_rect(
-            [0, -self.scale, self.chunklength, 2 * self.scale * n_lines]
-        )
-        self.line.update_variables(
-            lines=points,
-            vertex_colors=colours.reshape(-1, 3),
-            offset=self.scale*2,
+            [left, -self.scale, left + self.chunklength, self.spacing * self.line.n_lines]
         )
         self.update()
-    
+
+    def update_tile(self):
+        """Upload the tile around the view if the one on the GPU does not hold it
+
+        Panning within the tile changes nothing but the camera, which
+        culls the line strips to the samples in view.
+        """
+        if self.tile is not None:
+            start, length, chunklength, width = self.tile
+            if (
+                (chunklength, width) == (self.chunklength, self.width())
+                and start <= self.startidx
+                and self.startidx + self.chunklength <= start + length
+            ):
+                return
+        _, _, stride = self.tile_span(0)
+        index = self.startidx // stride
+        start, length, _ = self.tile_span(index)
+        line, packed = self.request_window(start, length=length).result()
+        self.line.adopt(line, packed)
+        self.update_channels()
+        self.tile = (start, length, self.chunklength, self.width())
+        # the tiles the view moves into next
+        for neighbour in (index - 1, index + 1):
+            start, length, _ = self.tile_span(neighbour)
+            if start >= 0 and length > 0:
+                self.request_window(start, prefetch=True, length=length)
+
+    def start_stream(self, n_channels, capacity, colours=None, scale=None):
+        """Switch to live mode, showing the last `capacity` samples appended
+
+        Parameters
+        ----------
+        n_channels : int
+            The number of channels appended at a time
+        capacity : int
+            The number of samples shown per channel
+        colours : np.ndarray (3,) or (n_channels, 3)
+            The colour of each channel
+        scale : float
+            The amplitude of the channels. If None, it is taken from the
+            first samples appended.
+        """
+        self.stop_stream()
+        self.source = None
+        self.stream = StreamingLineCollection(self.ctx, n_channels, capacity, colors=colours)
+        self.scale = scale
+        if scale is not None:
+            self.update_stream_scale()
+        self.update()
+
+    def stop_stream(self):
+        if self.stream is None:
+            return
+        if self.stream.ctx is not None:
+            self.makeCurrent()
+            self.stream.release()
+            self.doneCurrent()
+        self.stream = None
+
+    def append(self, samples):
+        """Append samples (n_channels, K) to the live view
+
+        Only the new samples are uploaded when the next frame is drawn.
+        """
+        if self.stream is None:
+            raise ValueError("No stream started")
+        samples = np.asarray(samples)
+        if self.scale is None:
+            self.scale = float(np.abs(samples).max()) or 1.0
+            self.update_stream_scale()
+        self.stream.append(samples)
+        self.update()
+
+    def update_stream_scale(self):
+        self.stream.update_variables(offset=self.scale*2)
+        self.camera.set_rect(
+            [0, -self.scale, self.stream.capacity, 2 * self.scale * self.stream.n_lines]
+        )
+
+    def resizeGL(self, w: int, h: int) -> None:
+        super().resizeGL(w, h)
+        if self.source is not None:
+            self.update_trace()
+
+    def closeEvent(self, event):
+        # queued windows and pyramid builds would keep reading the source
+        self.prefetcher.shutdown(wait=False, cancel_futures=True)
+        super().closeEvent(event)
+
     @property
     def nodes(self):
-        return [self.line]
+        return [self.line, self.stream]
     
     @property
     def cameras(self):
@@ -94,6 +454,9 @@ class ContinuousViewer(GLWidget):
     
     def render(self):
         self.ctx.clear()
-        if self.points is None:
+        if self.stream is not None:
+            self.stream.draw(self.camera)
+            return
+        if self.source is None:
             return
         self.line.draw(self.camera)
@@ -4,7 +4,7 @@ import numpy as np
 from numpy.typing import ArrayLike
 
 from pyqtmgl.glwidget import GLWidget
-from pyqtmgl.nodes.pointcloud import Pointcloud
+from pyqtmgl.nodes.pointcloud import Pointcloud, MarkerCloud
 from pyqtmgl.nodes.line import Line
 from pyqtmgl.nodes.node import Node
 from pyqtmgl.cameras import RectCamera, ScreenCamera
@@ -12,6 +12,7 @@ from pyqtmgl.cameras import RectCamera, ScreenCamera
 
 class GraphWidget(GLWidget):
     name = "Graph"
+    PREWARM_NODES = (Pointcloud, Line)
 
     def __init__(self):
         super().__init__()
@@ -50,10 +51,16 @@ class GraphWidget(GLWidget):
         self.nodes_by_name[name] = node
     
     def add_scatter(self, name: str, **kwargs):
-        """Add a scatter node with the given name and parameters."""
+        """Add a scatter node with the given name and parameters.
+
+        Passing a marker or per-point sizes draws instanced markers
+        (MarkerCloud) instead of GL points."""
         if name in self.nodes_by_name:
             raise KeyError(f"Node with name '{name}' already exists.")
-        node = Pointcloud(self.ctx, **kwargs)
+        if 'marker' in kwargs or 'sizes' in kwargs:
+            node = MarkerCloud(self.ctx, **kwargs)
+        else:
+            node = Pointcloud(self.ctx, **kwargs)
         self.add_node(name, node)
 
     def add_line(self, name: str, **kwargs):
@@ -66,7 +73,11 @@ class GraphWidget(GLWidget):
     def remove_node(self, name: str):
         """Remove a node by name."""
         if name in self.nodes_by_name:
-            del self.nodes_by_name[name]
+            node = self.nodes_by_name.pop(name)
+            if node.ctx is not None:
+                self.makeCurrent()
+                node.release()
+                self.doneCurrent()
 
     def update_node(self, name: str, **kwargs):
         """Update the specified node's variables (e.g., points, colors, etc.)"""
@@ -90,10 +101,61 @@ class GraphWidget(GLWidget):
         x, y = self.camera.unproject(self.screen_camera.project(pos)[:, :2])[0, :2]
         return x, y
 
+    def pick(self, pos, radius: float = 5) -> Optional[Tuple[str, int, float]]:
+        """Find the point closest to a position on the widget
+
+        Each node keeps a grid index of its points, so this only looks at
+        the points near pos.
+
+        Parameters
+        ----------
+        pos : QPoint or Tuple[float, float]
+            The position in widget pixels
+        radius : float
+            The search radius in pixels
+
+        Returns
+        -------
+        name : str
+            The name of the node holding the point
+        index : int
+            The index of the point in the node
+        distance : float
+            The distance to pos in pixels
+        None is returned if no point is within radius.
+        """
+        if self.camera is None or self.screen_camera is None:
+            raise ValueError("Camera not initialized")
+        if not isinstance(pos, tuple):
+            pos = (pos.x(), pos.y())
+        x, y = pos
+        # pos and the pixels one step right and down, to get the pixel size
+        screen = np.array([[x, y], [x + 1, y], [x, y + 1]], dtype='f8')
+        data = self.camera.unproject(self.screen_camera.project(screen)[:, :2])[:, :2]
+        pixel = np.abs([data[1, 0] - data[0, 0], data[2, 1] - data[0, 1]])
+        best = None
+        for name, node in self.nodes_by_name.items():
+            index = node.spatial_index()
+            if index is None:
+                continue
+            hit = index.nearest(data[0], pixel * radius)
+            if hit is not None and (best is None or hit[1] < best[2]):
+                best = (name, hit[0], hit[1])
+        if best is None:
+            return None
+        name, index, distance = best
+        return name, index, distance * radius
+
     def mouseMoveEvent(self, event):
         cursor = event.pos()
-        x, y = self.get_mouse_in_data_coords(cursor)
-        tooltip_text = f"Cursor at ({float(x):.2f}, {float(y):.2f})"
+        hit = self.pick(cursor)
+        if hit is None:
+            x, y = self.get_mouse_in_data_coords(cursor)
+            tooltip_text = f"Cursor at ({float(x):.2f}, {float(y):.2f})"
+        else:
+            name, index, _ = hit
+            x, y = self.nodes_by_name[name].variables['points'][index, :2]
+            tooltip_text = f"{name}[{index}] at ({float(x):.4g}, {float(y):.4g})"
         self.set_tooltip(tooltip_text, cursor)
         super().mouseMoveEvent(event)
 
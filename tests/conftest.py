@@ -0,0 +1,33 @@
+import pytest
+
+from pyqtmgl.offscreen import OffscreenRenderer, create_headless_context
+
+# the size of the images rendered by the tests
+SIZE = (200, 100)
+
+@pytest.fixture(scope='session')
+def ctx():
+    """A headless context shared by every test, EGL when available"""
+    try:
+        ctx = create_headless_context()
+    except Exception as error:
+        pytest.skip(f'No headless OpenGL context: {error}')
+    yield ctx
+    ctx.release()
+
+@pytest.fixture
+def renderer(ctx):
+    with OffscreenRenderer(SIZE, ctx=ctx) as renderer:
+        yield renderer
+
+@pytest.fixture
+def writes(monkeypatch):
+    """Record the names of the buffers written by Node.write_buffer"""
+    from pyqtmgl.nodes.node import Node
+    written = []
+    write_buffer = Node.write_buffer
+    def record(self, name, data):
+        written.append(name)
+        return write_buffer(self, name, data)
+    monkeypatch.setattr(Node, 'write_buffer', record)
+    return written
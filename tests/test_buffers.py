@@ -0,0 +1,54 @@
+import numpy as np
+
+from pyqtmgl.cameras import RectCamera
+from pyqtmgl.nodes.linecollection import LineCollection
+from pyqtmgl.nodes.pointcloud import Pointcloud
+
+def test_only_dirty_buffers_are_rewritten(renderer, writes):
+    camera = RectCamera([0, 0, 1, 1])
+    node = Pointcloud(None, np.random.rand(100, 2), colors=np.random.rand(100, 3), alphas=np.random.rand(100))
+    renderer.render([node], camera)
+    assert sorted(writes) == ['alphas', 'colors', 'points']
+    buffers = dict(node.buffers)
+
+    writes.clear()
+    renderer.render([node], camera)
+    assert writes == []
+
+    node.update_variables(alphas=np.random.rand(100))
+    renderer.render([node], camera)
+    assert writes == ['alphas']
+    assert all(node.buffers[name] is buffer for name, buffer in buffers.items())
+
+    writes.clear()
+    node.update_variables(colors=np.random.rand(100, 3))
+    renderer.render([node], camera)
+    assert writes == ['colors']
+
+def test_new_point_count_rewrites_every_buffer(renderer, writes):
+    camera = RectCamera([0, 0, 1, 1])
+    node = Pointcloud(None, np.random.rand(100, 2), colors=np.random.rand(100, 3))
+    renderer.render([node], camera)
+    writes.clear()
+    node.update_variables(points=np.random.rand(50, 2), colors=np.random.rand(50, 3))
+    renderer.render([node], camera)
+    assert sorted(writes) == ['colors', 'points']
+    assert node.buffers['points'].size == 50 * 3 * 4
+
+def test_line_alphas_leave_the_vertices_alone(renderer, writes):
+    camera = RectCamera([0, -1, 100, 4])
+    node = LineCollection(None, lines=np.random.rand(4, 100), offset=1.0)
+    before = renderer.render([node], camera).copy()
+    writes.clear()
+    node.update_variables(alphas=np.zeros(4))
+    after = renderer.render([node], camera)
+    assert writes == []
+    assert before[..., :3].any() and not after[..., :3].any()
+
+def test_constant_colors_are_not_uploaded_per_point(renderer, writes):
+    camera = RectCamera([0, 0, 1, 1])
+    node = Pointcloud(None, np.random.rand(100, 2), colors=[1, 0, 0], size=5)
+    image = renderer.render([node], camera)
+    assert node.buffers['colors'].size == 3 * 4
+    red = image[..., 0] > 0
+    assert red.any() and not image[red][:, 1:3].any()
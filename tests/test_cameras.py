@@ -0,0 +1,65 @@
+import glm
+import numpy as np
+import pytest
+
+from pyqtmgl.cameras import ArcballCamera, RectCamera, transform
+
+def reference(camera, verts):
+    """Project each vertex with glm in double precision, padded to (x, y, z, 1)"""
+    projection, view = camera.get_matrices()
+    mvp = glm.dmat4(projection * view)
+    result = []
+    for vert in np.asarray(verts, dtype='f8'):
+        p = mvp * glm.dvec4(*vert, *[0.0] * (3 - len(vert)), 1.0)
+        result.append([p.x / p.w, p.y / p.w, p.z / p.w])
+    return np.array(result)
+
+CAMERAS = [
+    lambda: RectCamera([-2, 1, 3, 5]),
+    lambda: ArcballCamera((800, 600)),
+]
+
+@pytest.mark.parametrize('camera', CAMERAS)
+@pytest.mark.parametrize('dims', [2, 3])
+@pytest.mark.parametrize('dtype', ['f4', 'f8'])
+def test_project_matches_the_homogeneous_product(camera, dims, dtype):
+    camera = camera()
+    verts = np.random.default_rng(0).random((100, dims)).astype(dtype)
+    projected = camera.project(verts)
+    assert projected.shape == (100, 3) and projected.dtype == dtype
+    tolerance = 1e-5 if dtype == 'f4' else 1e-12
+    assert np.allclose(projected, reference(camera, verts), rtol=tolerance, atol=tolerance)
+
+@pytest.mark.parametrize('camera', CAMERAS)
+def test_project_into_out(camera):
+    camera = camera()
+    verts = np.random.default_rng(1).random((100, 2))
+    out = np.full((100, 3), np.nan, dtype='f4')
+    assert camera.project(verts, out=out) is out
+    assert np.allclose(out, reference(camera, verts), atol=1e-5)
+    with pytest.raises(ValueError):
+        camera.project(verts, out=np.empty((100, 2)))
+    with pytest.raises(ValueError):
+        camera.project(verts, out=np.empty((99, 3)))
+
+@pytest.mark.parametrize('camera', CAMERAS)
+def test_unproject_inverts_project(camera):
+    camera = camera()
+    verts = np.random.default_rng(2).random((100, 3))
+    assert np.allclose(camera.unproject(camera.project(verts)), verts)
+
+def test_projection_follows_the_camera():
+    camera = RectCamera([0, 0, 1, 1])
+    assert np.allclose(camera.project([[0.5, 0.5]]), [[0, 0, 0]])
+    camera.rect = [0, 0, 2, 2]
+    assert np.allclose(camera.project([[0.5, 0.5]]), [[-0.5, -0.5, 0]])
+    assert np.allclose(camera.unproject([[1.0, 1.0]]), [[2, 2, 0]])
+
+def test_transform():
+    matrix = np.diag([2.0, 3.0, 4.0, 1.0])
+    matrix[:3, 3] = [1, 2, 3]
+    verts = np.array([[1, 1], [2, 0]])
+    # integer vertices give a float64 result
+    assert np.array_equal(transform(matrix, verts), [[3, 5, 3], [5, 2, 3]])
+    with pytest.raises(ValueError):
+        transform(matrix, np.zeros((5, 4)))
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from pyqtmgl.data import GridIndex
+
+def brute_force(points, xy, radius):
+    d = np.hypot(*((points[:, :2] - xy) / radius).T)
+    d[np.isnan(d)] = np.inf
+    best = int(np.argmin(d))
+    return (best, d[best]) if d[best] <= 1 else None
+
+@pytest.mark.parametrize('radius', [(0.01, 0.01), (0.05, 0.002), (0.3, 0.3)])
+def test_nearest_matches_brute_force(radius):
+    rng = np.random.default_rng(0)
+    # clustered points, so most cells are empty and some are crowded
+    points = np.concatenate([rng.random((2000, 3)), rng.normal(0.5, 0.01, (2000, 3))])
+    index = GridIndex(points)
+    for xy in rng.uniform(-0.1, 1.1, (200, 2)):
+        expected = brute_force(points, xy, np.asarray(radius))
+        hit = index.nearest(xy, radius)
+        if expected is None:
+            assert hit is None
+        else:
+            assert hit[0] == expected[0]
+            assert hit[1] == pytest.approx(expected[1])
+
+def test_nearest_outside_the_radius_is_none():
+    index = GridIndex(np.array([[0.0, 0.0], [1.0, 1.0]]))
+    assert index.nearest((0.5, 0.5), (0.1, 0.1)) is None
+    assert index.nearest((5.0, 5.0), (0.1, 0.1)) is None
+    # the radii are those of an ellipse, not of a box
+    assert index.nearest((0.08, 0.08), (0.1, 0.1)) is None
+    assert index.nearest((0.08, 0.0), (0.1, 0.1))[0] == 0
+
+def test_nan_points_are_skipped():
+    rng = np.random.default_rng(1)
+    points = rng.random((500, 2))
+    points[::3] = np.nan
+    index = GridIndex(points)
+    for xy in rng.random((50, 2)):
+        hit = index.nearest(xy, (0.2, 0.2))
+        assert hit[0] % 3 != 0
+        assert hit[0] == brute_force(points, xy, np.array([0.2, 0.2]))[0]
+    assert index.nearest(points[1], (1e-9, 1e-9)) == (1, 0.0)
+
+def test_degenerate_points():
+    index = GridIndex(np.ones((10, 2)))
+    assert index.nearest((1.0, 1.0), (0.1, 0.1))[1] == 0.0
+    assert GridIndex(np.zeros((0, 2))).nearest((0.0, 0.0), (1.0, 1.0)) is None
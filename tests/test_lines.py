@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from pyqtmgl.cameras import RectCamera
+from pyqtmgl.nodes.line import Line
+from pyqtmgl.nodes.linecollection import LineCollection
+
+def render_both(renderer, node, camera):
+    """Render a node culled, then with culling off"""
+    node.cull = True
+    culled = renderer.render([node], camera).copy()
+    node.cull = False
+    full = renderer.render([node], camera).copy()
+    node.cull = True
+    return culled, full
+
+@pytest.mark.parametrize('rect', [
+    [1000, 0, 2000, 1],
+    [-50, 0, 30, 1],
+    [99950, 0, 100100, 1],
+    [0, 0, 100000, 1],
+])
+def test_culled_line_renders_the_same(renderer, rect):
+    x = np.arange(100000, dtype='f8')
+    line = Line(None, points=np.c_[x, np.sin(x / 50) * 0.4 + 0.5], size=20)
+    camera = RectCamera(rect)
+    culled, full = render_both(renderer, line, camera)
+    assert np.array_equal(culled, full)
+    assert culled[..., :3].any()
+    first, stop = line.visible_segments(camera)
+    if rect[2] - rect[0] < 10000:
+        assert stop[0] - first[0] < 10000
+
+def test_culled_line_collection_renders_the_same(renderer):
+    lines = np.sin(np.arange(8 * 20000).reshape(8, -1) / 30) * 0.4
+    node = LineCollection(None, lines=lines, offset=1.0, size=10)
+    camera = RectCamera([500, -1, 900, 8])
+    culled, full = render_both(renderer, node, camera)
+    assert np.array_equal(culled, full)
+    assert culled[..., :3].any()
+    first, stop = node.visible_segments(camera)
+    assert (first > 400).all() and (stop < 1000).all()
+
+def test_wide_lines_reaching_into_the_view_are_kept(renderer):
+    # a steep segment just left of the view, widened by the line width
+    points = np.array([[0.9, 1.0], [0.99, 0.0], [3.0, 0.0]])
+    line = Line(None, points=points, size=400)
+    culled, full = render_both(renderer, line, RectCamera([1.0, 0, 2.0, 1]))
+    assert np.array_equal(culled, full)
+
+def test_unsorted_lines_are_not_culled():
+    line = Line(None, points=np.random.default_rng(0).random((100, 2)))
+    assert line.visible_segments(RectCamera([0.2, 0, 0.4, 1])) is None
+    line = Line(None, points=np.c_[np.arange(100), np.zeros(100)])
+    assert line.visible_segments(RectCamera([20, 0, 40, 1])) is not None
+    line.cull = False
+    assert line.visible_segments(RectCamera([20, 0, 40, 1])) is None
+
+@pytest.mark.parametrize('cull', [True, False])
+@pytest.mark.parametrize('rect', [[0, -1, 2000, 8], [500, -1, 900, 8]])
+def test_strips_render_like_segments(renderer, rect, cull):
+    lines = np.sin(np.arange(8 * 2000).reshape(8, -1) / 30) * 0.4
+    segments = LineCollection(None, lines=lines, offset=1.0, size=10)
+    strips = LineCollection(None, lines=lines, offset=1.0, size=10, strips=True)
+    segments.cull = strips.cull = cull
+    camera = RectCamera(rect)
+    image = renderer.render([segments], camera).copy()
+    assert np.array_equal(renderer.render([strips], camera), image)
+    assert image[..., :3].any()
+    assert strips.variables['indices'].size < segments.variables['indices'].size
+
+def test_strip_indices_are_kept_for_the_same_shape():
+    lines = np.random.default_rng(0).random((4, 100))
+    node = LineCollection(None, lines=lines, offset=1.0, strips=True)
+    indices = node.variables['indices']
+    node.update_variables(lines=lines * 2)
+    assert node.variables['indices'] is indices
+    node.update_variables(lines=lines[:, :50])
+    assert node.variables['indices'].size < indices.size
+
+def test_line_parameters_render_like_transformed_lines(renderer, writes):
+    rng = np.random.default_rng(0)
+    lines = np.sin(np.arange(4 * 500).reshape(4, -1) / 20)
+    colors = rng.random((4, 3))
+    gains, offsets = np.array([0.2, 0.4, 0.1, 0.3]), np.array([0.0, 1.0, 2.5, 3.0])
+    visible = np.array([True, False, True, True])
+    camera = RectCamera([0, -1, 500, 4])
+
+    node = LineCollection(None, lines=lines, colors=colors, size=20)
+    renderer.render([node], camera)
+    writes.clear()
+    node.update_variables(gains=gains, offset=offsets, visible=visible)
+    image = renderer.render([node], camera).copy()
+    # the vertices stay on the GPU, only the small draw commands change
+    assert writes == ['commands']
+
+    shown = lines[visible] * gains[visible, None] + offsets[visible, None]
+    reference = LineCollection(None, lines=shown, colors=colors[visible], size=20)
+    assert np.array_equal(image, renderer.render([reference], camera))
+    drawn = node.drawn_points().reshape(4, -1, 3)
+    assert np.isnan(drawn[1, :, :2]).all()
+    assert np.allclose(drawn[visible, :, 1], shown)
+
+def test_per_line_variables_are_checked():
+    node = LineCollection(None, lines=np.zeros((4, 10)))
+    with pytest.raises(ValueError):
+        node.update_variables(gains=np.ones(3))
+    node.update_variables(gains=2.0)
+    assert np.array_equal(node.variables['gains'], np.full(4, 2.0))
@@ -0,0 +1,73 @@
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from pyqtmgl.cameras import RectCamera
+from pyqtmgl.nodes.pointcloud import Pointcloud
+from pyqtmgl.offscreen import OffscreenRenderer, encode_png
+
+from conftest import SIZE
+
+def decode_png(data):
+    """Decode the 8 bit RGBA or RGB PNGs written by encode_png"""
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    chunks, position = {}, 8
+    while position < len(data):
+        length, kind = struct.unpack('>I4s', data[position:position + 8])
+        body = data[position + 8:position + 8 + length]
+        crc, = struct.unpack('>I', data[position + 8 + length:position + 12 + length])
+        assert crc == zlib.crc32(kind + body)
+        chunks[kind] = chunks.get(kind, b'') + body
+        position += 12 + length
+    assert b'IEND' in chunks
+    width, height, depth, color_type = struct.unpack('>IIBB', chunks[b'IHDR'][:10])
+    assert depth == 8
+    channels = {6: 4, 2: 3}[color_type]
+    rows = np.frombuffer(zlib.decompress(chunks[b'IDAT']), np.uint8).reshape(height, -1)
+    # every row is unfiltered
+    assert not rows[:, 0].any()
+    return rows[:, 1:].reshape(height, width, channels)
+
+def scene():
+    points = np.random.default_rng(0).random((50, 2))
+    return [Pointcloud(None, points, colors=[1, 0.5, 0], size=20)], RectCamera([0, 0, 1, 1])
+
+def test_render_png_matches_render(renderer):
+    nodes, camera = scene()
+    image = renderer.render(nodes, camera).copy()
+    decoded = decode_png(renderer.render_png(nodes, camera))
+    assert decoded.shape == (SIZE[1], SIZE[0], 4)
+    assert np.array_equal(decoded, image)
+    assert (image[..., 0] == 255).any()
+
+def test_render_png_size(renderer):
+    nodes, camera = scene()
+    decoded = decode_png(renderer.render_png(nodes, camera, size=(64, 32)))
+    assert decoded.shape == (32, 64, 4)
+
+def test_image_rows_go_top_down(renderer):
+    camera = RectCamera([0, 0, 1, 1])
+    # a point near the top left corner of the view
+    node = Pointcloud(None, np.array([[0.1, 0.9]]), colors=[1, 1, 1], size=10)
+    rows, cols = np.nonzero(renderer.render([node], camera)[..., 0])
+    assert rows.mean() < SIZE[1] / 2 and cols.mean() < SIZE[0] / 2
+
+def test_save(renderer, tmp_path):
+    nodes, camera = scene()
+    path = tmp_path / 'scene.png'
+    renderer.save(path, nodes, camera)
+    assert np.array_equal(decode_png(path.read_bytes()), renderer.render(nodes, camera))
+
+def test_multisampled_renderer(ctx):
+    nodes, camera = scene()
+    with OffscreenRenderer(SIZE, ctx=ctx, samples=4) as renderer:
+        image = renderer.render(nodes, camera)
+        assert image.shape == (SIZE[1], SIZE[0], 4) and image[..., 0].any()
+
+def test_encode_png():
+    image = np.random.default_rng(0).integers(0, 256, (5, 7, 3), dtype=np.uint8)
+    assert np.array_equal(decode_png(encode_png(image)), image)
+    with pytest.raises(ValueError):
+        encode_png(np.zeros((5, 7)))
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from pyqtmgl.cameras import RectCamera
+from pyqtmgl.nodes.line import Line
+from pyqtmgl.nodes.linecollection import LineCollection
+from pyqtmgl.nodes.pointcloud import MarkerCloud, Pointcloud
+from pyqtmgl.picking import PickBuffer
+
+from conftest import SIZE
+
+# pixels are counted from the top left corner of the (200, 100) view
+POINTS = np.array([[0.25, 0.5], [0.75, 0.5]])
+
+@pytest.fixture
+def picker(ctx):
+    picker = PickBuffer(ctx)
+    yield picker
+    picker.release()
+
+@pytest.fixture
+def nodes(ctx):
+    return [
+        Pointcloud(ctx, POINTS, size=5),
+        MarkerCloud(ctx, POINTS + [0, 0.3], size=10),
+        Line(ctx, points=np.c_[np.linspace(0, 1, 11), np.full(11, 0.2)], size=200),
+    ]
+
+@pytest.mark.parametrize('pos, expected', [
+    ((50, 50), (0, 0)),
+    ((151, 49), (0, 1)),
+    ((50, 20), (1, 0)),
+    ((148, 21), (1, 1)),
+    # the line is at row 80, and x = 0.63 lies on the segment from 0.6 to 0.7
+    ((126, 80), (2, 6)),
+    ((30, 81), (2, 1)),
+])
+def test_pick_points_and_segments(picker, nodes, pos, expected):
+    camera = RectCamera([0, 0, 1, 1])
+    node, index = picker.pick(nodes, camera, SIZE, pos)
+    assert (nodes.index(node), index) == expected
+
+def test_pick_nothing(picker, nodes):
+    camera = RectCamera([0, 0, 1, 1])
+    assert picker.pick(nodes, camera, SIZE, (100, 5), radius=1) is None
+    # the nearest drawn pixel within the radius is used
+    assert picker.pick(nodes, camera, SIZE, (50, 45), radius=1) is None
+    assert picker.pick(nodes, camera, SIZE, (50, 45), radius=8)[1] == 0
+
+@pytest.mark.parametrize('strips', [False, True])
+def test_pick_line_collection(ctx, picker, strips):
+    camera = RectCamera([0, 0, 10, 1])
+    lines = LineCollection(ctx, lines=np.full((3, 11), 0.1), offset=0.3, size=40, strips=strips)
+    # line 1 is at y = 0.4, row 60, and x = 5.2 lies after its point 5
+    node, index = picker.pick([lines], camera, SIZE, (104, 60))
+    assert node is lines and index == 11 + 5
+    node, index = picker.pick([lines], camera, SIZE, (104, 30))
+    assert index == 22 + 5
+
+def test_pick_keeps_the_viewport(ctx, picker, nodes, renderer):
+    camera = RectCamera([0, 0, 1, 1])
+    image = renderer.render(nodes, camera).copy()
+    picker.pick(nodes, camera, (400, 300), (100, 150))
+    assert np.array_equal(renderer.render(nodes, camera), image)
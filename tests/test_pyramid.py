@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from pyqtmgl.data import MinMaxPyramid
+
+@pytest.fixture
+def traces():
+    rng = np.random.default_rng(0)
+    return rng.standard_normal((3, 2**16)).cumsum(axis=1).astype('f4')
+
+def columns(x, y, start, stop, n_pixels):
+    """The min and max of the vertices in each pixel column"""
+    width = (stop - start) / n_pixels
+    column = ((x - start) // width).astype(int)
+    return [
+        (y[:, column == c].min(axis=1), y[:, column == c].max(axis=1))
+        for c in range(n_pixels)
+    ]
+
+def test_query_keeps_the_extremes_of_every_column(traces):
+    pyramid = MinMaxPyramid(traces)
+    start, stop, n_pixels = 8192, 8192 + 48 * 1024, 48
+    x, y = pyramid.query(start, stop, n_pixels)
+    assert x.size <= 2 * n_pixels
+    assert y.shape == (3, x.size)
+    for c, (lo, hi) in enumerate(columns(x, y, start, stop, n_pixels)):
+        raw = traces[:, start + c * 1024:start + (c + 1) * 1024]
+        np.testing.assert_array_equal(lo, raw.min(axis=1))
+        np.testing.assert_array_equal(hi, raw.max(axis=1))
+
+@pytest.mark.parametrize('options', [{}, {'min_level': 3}, {'max_level': 0}])
+def test_query_over_everything_keeps_the_range(traces, options):
+    pyramid = MinMaxPyramid(traces, **options)
+    x, y = pyramid.query(0, traces.shape[1], 500)
+    assert x.size <= 1000
+    np.testing.assert_array_equal(y.min(axis=1), traces.min(axis=1))
+    np.testing.assert_array_equal(y.max(axis=1), traces.max(axis=1))
+
+def test_close_zoom_returns_the_raw_samples(traces):
+    x, y = MinMaxPyramid(traces).query(100, 300, 200)
+    np.testing.assert_array_equal(x, np.arange(100, 300))
+    np.testing.assert_array_equal(y, traces[:, 100:300])
+
+def test_range(traces):
+    assert MinMaxPyramid(traces).range() == (traces.min(), traces.max())
+    assert MinMaxPyramid(traces, max_level=0).levels == []
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from pyqtmgl.data import ArraySource, MinMaxPyramid, RawFileSource
+from pyqtmgl.data.sources import as_source
+
+@pytest.fixture
+def traces():
+    rng = np.random.default_rng(0)
+    return rng.standard_normal((3, 2**16)).cumsum(axis=1).astype('f4')
+
+@pytest.mark.parametrize('layout', ['interleaved', 'contiguous'])
+def test_raw_file_source_reads(tmp_path, traces, layout):
+    data = (traces * 100).astype('i2')
+    path = tmp_path / 'traces.dat'
+    header = b'\0' * 16
+    samples = data.T if layout == 'interleaved' else data
+    path.write_bytes(header + np.ascontiguousarray(samples).tobytes())
+    source = RawFileSource(str(path), 'i2', 3, layout=layout, offset=len(header))
+    assert source.shape == data.shape
+    assert source.dtype == np.int16
+    np.testing.assert_array_equal(source.read(0, data.shape[1]), data)
+    np.testing.assert_array_equal(source.read(1000, 1010), data[:, 1000:1010])
+    assert source.estimate_range(n_blocks=64, blocksize=1024) == (data.min(), data.max())
+    lo, hi = source.estimate_range(n_blocks=4, blocksize=16)
+    assert data.min() <= lo <= hi <= data.max()
+
+def test_raw_file_pyramid_matches_the_array_one(tmp_path, traces):
+    path = tmp_path / 'traces.dat'
+    path.write_bytes(np.ascontiguousarray(traces.T).tobytes())
+    source = RawFileSource(str(path), 'f4', 3)
+    for args in [(0, traces.shape[1], 300), (5000, 9000, 300), (10, 20, 300)]:
+        x, y = MinMaxPyramid(source, chunksize=4096).query(*args)
+        x_ref, y_ref = MinMaxPyramid(traces).query(*args)
+        np.testing.assert_array_equal(x, x_ref)
+        np.testing.assert_array_equal(y, y_ref)
+
+def test_array_source(traces):
+    source = as_source(traces)
+    assert isinstance(source, ArraySource)
+    assert as_source(source) is source
+    np.testing.assert_array_equal(source.read(10, 20), traces[:, 10:20])
+    assert ArraySource(traces[0]).shape == (1, traces.shape[1])
+    with pytest.raises(ValueError):
+        ArraySource(np.zeros((2, 2, 2)))
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from pyqtmgl.cameras import RectCamera
+from pyqtmgl.nodes.linecollection import LineCollection, StreamingLineCollection
+
+COLORS = [[1, 0, 0], [0, 1, 0], [0, 0, 1]]
+
+def reference(history, capacity):
+    """The LineCollection of the last samples, the newest at capacity - 1"""
+    last = history[:, -capacity:]
+    x = np.arange(capacity - last.shape[1], capacity)
+    lines = np.stack(np.broadcast_arrays(x[None], last), axis=2)
+    return LineCollection(None, lines=lines, colors=COLORS, offset=1.0, size=100, strips=True)
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_ring_renders_like_the_last_samples(renderer, seed):
+    rng = np.random.default_rng(seed)
+    capacity = 100
+    camera = RectCamera([0, -1, capacity, 4])
+    stream = StreamingLineCollection(None, 3, capacity, colors=COLORS, offset=1.0, size=100)
+    history = np.zeros((3, 0), dtype='f4')
+    # short appends fill the ring first, then random lengths wrap it
+    # several times, some longer than the ring itself
+    lengths = [20, 30] + list(rng.integers(1, 2 * capacity, 10))
+    for length in lengths:
+        samples = rng.random((3, length)).astype('f4')
+        stream.append(samples)
+        history = np.concatenate([history, samples], axis=1)
+        image = renderer.render([stream], camera).copy()
+        assert image[..., :3].any()
+        assert np.array_equal(image, renderer.render([reference(history, capacity)], camera))
+
+    values = np.frombuffer(stream.buffers['values'].read(), 'f4').reshape(3, capacity + 1)
+    assert np.array_equal(values, stream.variables['values'])
+    # the ring holds the last samples from the head on, and its last slot mirrors the first
+    ring = np.roll(values[:, :capacity], -stream.head, axis=1)
+    assert np.array_equal(ring, history[:, -capacity:])
+    assert np.array_equal(values[:, capacity], values[:, 0])
+
+def test_reset_clears_the_ring(renderer):
+    camera = RectCamera([0, -1, 100, 4])
+    stream = StreamingLineCollection(None, 3, 100, colors=COLORS, offset=1.0, size=100)
+    stream.append(np.random.rand(3, 150))
+    assert renderer.render([stream], camera)[..., :3].any()
+    stream.reset()
+    assert not renderer.render([stream], camera)[..., :3].any()
+
+def test_wrong_sample_shape_raises():
+    stream = StreamingLineCollection(None, 3, 100)
+    with pytest.raises(ValueError):
+        stream.append(np.zeros((2, 10)))